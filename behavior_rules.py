@@ -0,0 +1,121 @@
+"""
+Landmark features and behavior rules for the body tracking server.
+
+Each frame's Holistic landmarks are converted once into (N, 4) float32
+arrays of [x, y, z, visibility]. Joint angles for every joint in
+JOINT_ANGLES are computed in one vectorized call, and behaviors are rules
+(label, group, predicate) evaluated over those features. A new behavior is
+one more entry in BEHAVIOR_RULES (and, if it needs one, a joint angle in
+JOINT_ANGLES); the landmarks are never walked again.
+
+Groups: "body" rules all apply (the active statuses, in rule order);
+"mouth" rules are exclusive, the first match wins.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# MediaPipe PoseLandmark indices
+LEFT_EYE, RIGHT_EYE = 2, 5
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Face mesh indices
+UPPER_LIP, LOWER_LIP = 13, 14
+
+# Angle at the middle landmark of each (a, b, c)
+JOINT_ANGLES = {
+    "left_knee": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "right_knee": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    "left_elbow": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "right_elbow": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+}
+_JOINT_NAMES = tuple(JOINT_ANGLES)
+_JOINT_INDEX = np.array([JOINT_ANGLES[name] for name in _JOINT_NAMES], dtype=np.intp)
+
+MOUTH_OPEN_DISTANCE = 0.05  # normalized lip gap
+SHOUT_EMOTIONS = ("angry", "fear", "surprise")
+
+
+def landmarks_array(landmark_list):
+    """(N, 4) float32 [x, y, z, visibility] from a MediaPipe landmark list, or None."""
+    if landmark_list is None:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmark_list.landmark],
+                    dtype=np.float32)
+
+
+def joint_angles(points, index=_JOINT_INDEX):
+    """Angles in degrees (0..180) at b for every (a, b, c) row of `index`, from the x/y columns."""
+    a, b, c = points[index[:, 0], :2], points[index[:, 1], :2], points[index[:, 2], :2]
+    radians = np.arctan2(c[:, 1] - b[:, 1], c[:, 0] - b[:, 0]) - np.arctan2(a[:, 1] - b[:, 1], a[:, 0] - b[:, 0])
+    angles = np.abs(np.degrees(radians))
+    return np.where(angles > 180.0, 360.0 - angles, angles)
+
+
+def calculate_angle(a, b, c):
+    """Calculates the angle at point b given three points [x, y]"""
+    return float(joint_angles(np.array([a, b, c], dtype=np.float64), np.array([[0, 1, 2]]))[0])
+
+
+class LandmarkFeatures:
+    """Everything the rules look at for one frame, computed once."""
+
+    def __init__(self, pose, face, emotion="neutral"):
+        self.pose = pose
+        self.face = face
+        self.emotion = emotion
+        self.angles = dict(zip(_JOINT_NAMES, joint_angles(pose))) if pose is not None else {}
+
+        # Lip gap, 0 when the lips are not both visible
+        self.mouth_open = 0.0
+        if face is not None and len(face) > LOWER_LIP:
+            lips = face[[UPPER_LIP, LOWER_LIP]]
+            if (lips[:, 3] > 0.5).all():
+                self.mouth_open = float(abs(lips[0, 1] - lips[1, 1]))
+
+    def visible(self, *indices, min_visibility=0.5):
+        return self.pose is not None and bool((self.pose[list(indices), 3] > min_visibility).all())
+
+    def above(self, a, b):
+        # Image y grows downwards
+        return bool(self.pose[a, 1] < self.pose[b, 1])
+
+    def angle(self, joint):
+        return self.angles[joint]
+
+
+Rule = namedtuple("Rule", ["label", "group", "when"])
+
+BEHAVIOR_RULES = (
+    Rule("RIGHT HAND UP", "body",
+         lambda f: f.visible(RIGHT_WRIST, RIGHT_EYE) and f.above(RIGHT_WRIST, RIGHT_EYE)),
+    Rule("LEFT HAND UP", "body",
+         lambda f: f.visible(LEFT_WRIST, LEFT_EYE) and f.above(LEFT_WRIST, LEFT_EYE)),
+    Rule("STANDING", "body",
+         lambda f: f.visible(LEFT_KNEE, LEFT_ANKLE, min_visibility=0.6) and f.angle("left_knee") > 160),
+    Rule("SITTING", "body",
+         lambda f: f.visible(LEFT_KNEE, LEFT_ANKLE, min_visibility=0.6) and f.angle("left_knee") < 140),
+    Rule("SHOUTING", "mouth",
+         lambda f: f.mouth_open > MOUTH_OPEN_DISTANCE and f.emotion in SHOUT_EMOTIONS),
+    Rule("Mouth Open", "mouth",
+         lambda f: f.mouth_open > MOUTH_OPEN_DISTANCE),
+)
+
+
+def evaluate_rules(features, rules=BEHAVIOR_RULES):
+    """{"body": [labels], "mouth": label or ""} for one frame."""
+    body, mouth = [], ""
+    for rule in rules:
+        if rule.group == "mouth" and mouth:
+            continue
+        if rule.when(features):
+            if rule.group == "mouth":
+                mouth = rule.label
+            else:
+                body.append(rule.label)
+    return {"body": body, "mouth": mouth}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Parity check + throughput report for the model backends in model_backend.py.
+
+Every backend runs on the same frames; detections are matched against the
+PyTorch reference (same class, IoU >= 0.5) and throughput is measured for
+single frames and for batches like the server's inference service sends.
+
+Usage: python bench_backends.py [--backends onnx onnx-int8 openvino openvino-int8]
+                                [--source test_video3.mp4] [--frames 50] [--batch 8] [--conf 0.6]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from model_backend import MODEL_BACKENDS, calibration_frames, load_detector
+
+PREDICT_KWARGS = dict(imgsz=640, conf=0.6, iou=0.5, device="cpu", verbose=False)
+
+
+def video_frames(path, n):
+    import cv2
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def detections(model, frames):
+    out = []
+    for r in model.predict(source=frames, **PREDICT_KWARGS):
+        b = r.boxes
+        out.append((b.xyxy.cpu().numpy(), b.cls.cpu().numpy().astype(int), b.conf.cpu().numpy()))
+    return out
+
+
+def iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def parity(reference, candidate, iou_thr=0.5):
+    """Greedy per-frame matching. Returns (recall, precision, mean IoU, mean |conf diff|)."""
+    n_ref = n_cand = matched = 0
+    ious, dconf = [], []
+    for (rb, rc, rconf), (cb, cc, cconf) in zip(reference, candidate):
+        n_ref += len(rb)
+        n_cand += len(cb)
+        if len(rb) == 0 or len(cb) == 0:
+            continue
+        m = iou_matrix(rb, cb)
+        m[rc[:, None] != cc[None, :]] = 0.0
+        while True:
+            i, j = np.unravel_index(np.argmax(m), m.shape)
+            if m[i, j] < iou_thr:
+                break
+            matched += 1
+            ious.append(m[i, j])
+            dconf.append(abs(rconf[i] - cconf[j]))
+            m[i, :] = 0.0
+            m[:, j] = 0.0
+    recall = matched / n_ref if n_ref else 1.0
+    precision = matched / n_cand if n_cand else 1.0
+    return recall, precision, float(np.mean(ious)) if ious else 0.0, float(np.mean(dconf)) if dconf else 0.0, n_ref, n_cand
+
+
+def throughput(model, frames, batch):
+    model.predict(source=frames[:batch], **PREDICT_KWARGS)  # warm-up
+    t0 = time.perf_counter()
+    for i in range(0, len(frames), batch):
+        model.predict(source=frames[i:i + batch], **PREDICT_KWARGS)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--backends", nargs="+", default=[b for b in MODEL_BACKENDS if b != "torch"],
+                        choices=MODEL_BACKENDS)
+    parser.add_argument("--source", default=None, help="video to test on (default: frames from uploads/)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--conf", type=float, default=PREDICT_KWARGS["conf"], help="confidence threshold (server uses 0.6)")
+    args = parser.parse_args()
+    PREDICT_KWARGS["conf"] = args.conf
+
+    frames = video_frames(args.source, args.frames) if args.source else calibration_frames("uploads", args.frames)
+    print(f"[INFO] {len(frames)} test frames")
+
+    reference_model = load_detector(args.weights, backend="torch")
+    reference = detections(reference_model, frames)
+
+    rows = [("torch", (1.0, 1.0, 1.0, 0.0, sum(len(r[0]) for r in reference), sum(len(r[0]) for r in reference)),
+             throughput(reference_model, frames, 1), throughput(reference_model, frames, args.batch))]
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        model = load_detector(args.weights, backend=backend)
+        rows.append((backend, parity(reference, detections(model, frames)),
+                     throughput(model, frames, 1), throughput(model, frames, args.batch)))
+
+    print()
+    print(f"{'backend':>14} {'recall':>7} {'prec':>7} {'mIoU':>6} {'dconf':>6} {'boxes':>7}"
+          f" {'fps@1':>7} {f'fps@{args.batch}':>7}")
+    for backend, (recall, precision, miou, dconf, n_ref, n_cand), fps1, fpsb in rows:
+        print(f"{backend:>14} {recall:>7.3f} {precision:>7.3f} {miou:>6.3f} {dconf:>6.3f} {n_cand:>7}"
+              f" {fps1:>7.1f} {fpsb:>7.1f}")
+    print("\nrecall/precision: share of PyTorch boxes matched (same class, IoU >= 0.5) / share of backend boxes matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+One capture + inference producer per physical source, fanned out to any
+number of stream subscribers.
+
+The producer runs a live FramePipeline and publishes only the latest frame.
+Each subscriber waits for a frame newer than the last one it sent, so a slow
+client skips straight to the newest frame and never blocks the producer or
+the other clients. A frame holds the images for every mode with subscribers
+("raw", "processed"); each JPEG variant (mode, width, quality) is encoded
+once per frame and shared by every client on the same delivery profile.
+The producer starts with the first subscriber and stops `grace_seconds`
+after the last one leaves (a page reload reuses the running producer). A
+producer started while the previous one for the same source is still
+stopping waits for it to release the device before opening it again.
+"""
+import threading
+import time
+
+from delivery import encode_variant
+from pipeline import STOP_JOIN_TIMEOUT, FramePipeline
+
+
+class BroadcastFrame:
+    """
+    One published frame: images per mode, optional per-frame metadata and the
+    JPEG variants, encoded on first use. Modes that share the same image object
+    (e.g. "raw" and "meta") share its encodes too.
+    """
+
+    def __init__(self, images, metadata=None):
+        self.seq = 0
+        self.images = images
+        self.metadata = metadata
+        self._encoded = {}    # (mode, width, quality) -> bytes, for variants()
+        self._by_image = {}   # (id(image), width, quality) -> bytes
+        self._lock = threading.Lock()
+
+    def jpeg(self, mode, max_width=None, quality=95):
+        key = (mode, max_width, quality)
+        with self._lock:
+            if key in self._encoded:
+                return self._encoded[key]
+            image = self.images.get(mode)
+            image_key = (id(image), max_width, quality)
+            if image_key not in self._by_image:
+                self._by_image[image_key] = encode_variant(image, max_width, quality)
+            data = self._encoded[key] = self._by_image[image_key]
+            return data
+
+    def variants(self):
+        with self._lock:
+            return list(self._encoded)
+
+
+class FrameBroadcaster:
+    """
+    open_capture() returns an opened cv2.VideoCapture (or None),
+    process(frame, frame_idx, modes) returns ({mode: image}, metadata or None) for the requested modes,
+    on_stop() runs once, after the last frame was processed (e.g. to release tracker state).
+    """
+
+    def __init__(self, name, open_capture, process, on_stop=None):
+        self.name = name
+        self.open_capture = open_capture
+        self.process = process
+        self.on_stop = on_stop
+
+        self.subscribers = {}  # mode -> count
+        self.frames_published = 0
+        self.started_at = None
+        self.stopping = False
+        self.done = False
+        self.pipeline = None
+
+        self._latest = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def active_modes(self):
+        return {mode for mode, n in self.subscribers.items() if n > 0}
+
+    def subscriber_count(self):
+        return sum(self.subscribers.values())
+
+    # ---------- producer ----------
+    def start(self, after=None):
+        """after: a stopping broadcaster of the same source, waited for before opening the capture."""
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, args=(after,), name=f"{self.name}-broadcast", daemon=True)
+        self._thread.start()
+
+    def wait_stopped(self, timeout=None):
+        """Blocks until the producer thread has ended (capture released, stages joined)."""
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        return self.done
+
+    def stop(self):
+        self.stopping = True
+        if self.pipeline is not None:
+            # The producer thread joins the stages when its frames() loop ends
+            self.pipeline.stop(join=False)
+
+    def _process(self, frame, frame_idx):
+        return self.process(frame, frame_idx, self.active_modes())
+
+    def _encode(self, processed):
+        # Encode stage: pre-encode the variants clients asked for on the previous frame
+        images, metadata = processed
+        out = BroadcastFrame(images, metadata)
+        previous = self._latest
+        wanted = previous.variants() if previous is not None else [(mode, None, 95) for mode in images]
+        for mode, max_width, quality in wanted:
+            if mode in images and self.subscribers.get(mode):
+                out.jpeg(mode, max_width, quality)
+        return out
+
+    def _run(self, after=None):
+        try:
+            if after is not None and not after.wait_stopped(STOP_JOIN_TIMEOUT):
+                print(f"[WARN] {self.name}: previous producer still running, opening the capture anyway")
+            if self.stopping:
+                return
+            cap = self.open_capture()
+            if cap is None or not cap.isOpened():
+                print(f"[WARN] {self.name}: could not open capture")
+                if cap is not None:
+                    cap.release()
+                return
+            # on_stop runs on the inference stage after its last frame
+            self.pipeline = FramePipeline(self.name, cap, process=self._process, encode=self._encode,
+                                          live=True, on_stop=self.on_stop)
+            if self.stopping:
+                self.pipeline.stop(join=False)
+            for out in self.pipeline.frames():
+                with self._cond:
+                    self.frames_published += 1
+                    out.seq = self.frames_published
+                    self._latest = out
+                    self._cond.notify_all()
+        except Exception as e:
+            print(f"[ERROR] {self.name}: broadcast producer failed: {e}")
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+            # Without a pipeline nothing ran on_stop yet
+            if self.pipeline is None and self.on_stop is not None:
+                self.on_stop()
+
+    # ---------- subscribers ----------
+    def frames(self, mode, delivery=None, with_metadata=False):
+        """
+        Yields JPEG bytes for `mode`, always the newest frame; ends when the producer stops.
+        `delivery` (AdaptiveDelivery) caps fps and picks the variant per client.
+        with_metadata=True yields (jpeg, metadata) pairs instead.
+        """
+        last_seq = 0
+        while True:
+            if delivery is not None:
+                delivery.wait_due()
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self.done or (self._latest is not None and self._latest.seq > last_seq),
+                    timeout=1.0
+                )
+                latest = self._latest
+                if latest is None or latest.seq <= last_seq:
+                    if self.done:
+                        return
+                    continue
+            if delivery is not None and last_seq:
+                # Frames published since the last send that this client never got
+                delivery.skip(latest.seq - last_seq - 1)
+            last_seq = latest.seq
+            data = latest.jpeg(mode, *delivery.variant()) if delivery is not None else latest.jpeg(mode)
+            if data is None:
+                continue
+            t0 = time.perf_counter()
+            yield (data, latest.metadata) if with_metadata else data
+            if delivery is not None:
+                delivery.record(len(data), time.perf_counter() - t0, started=t0)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "running": not self.done,
+            "stopping": self.stopping,
+            "subscribers": dict(self.subscribers),
+            "frames_published": self.frames_published,
+            "uptime_s": round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+        }
+
+
+class BroadcastHub:
+    """Registry of running broadcasters, one per source key."""
+
+    def __init__(self, grace_seconds=3.0):
+        self.grace_seconds = float(grace_seconds)
+        self._broadcasters = {}
+        self._stopping = {}  # key -> last stopped broadcaster, until its producer has ended
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, mode, factory, delivery=None, with_metadata=False):
+        """
+        Generator of JPEG bytes for `mode` from the producer for `key`;
+        factory() builds a FrameBroadcaster when none is running.
+        """
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            broadcaster = self._broadcasters.get(key)
+            if broadcaster is None or broadcaster.stopping or broadcaster.done:
+                previous = broadcaster or self._stopping.get(key)
+                self._stopping.pop(key, None)
+                broadcaster = factory()
+                self._broadcasters[key] = broadcaster
+                # The previous producer may still hold the device
+                broadcaster.start(after=previous if previous is not None and not previous.done else None)
+            broadcaster.subscribers[mode] = broadcaster.subscribers.get(mode, 0) + 1
+        try:
+            yield from broadcaster.frames(mode, delivery, with_metadata)
+        finally:
+            self._unsubscribe(key, mode, broadcaster)
+
+    def _unsubscribe(self, key, mode, broadcaster):
+        with self._lock:
+            broadcaster.subscribers[mode] -= 1
+            if broadcaster.subscriber_count() > 0 or self._broadcasters.get(key) is not broadcaster:
+                return
+            if broadcaster.done:
+                del self._broadcasters[key]
+                return
+            timer = threading.Timer(self.grace_seconds, self._stop_if_idle, args=(key, broadcaster))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def _stop_if_idle(self, key, broadcaster):
+        with self._lock:
+            if self._timers.get(key) is threading.current_thread():
+                del self._timers[key]
+            if broadcaster.subscriber_count() > 0:
+                return
+            if self._broadcasters.get(key) is broadcaster:
+                del self._broadcasters[key]
+                self._stopping[key] = broadcaster
+            broadcaster.stop()
+        print(f"[INFO] {broadcaster.name}: no subscribers left, producer stopped")
+
+    def stats(self):
+        with self._lock:
+            broadcasters = list(self._broadcasters.values())
+        return [b.stats() for b in broadcasters]
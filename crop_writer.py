@@ -0,0 +1,153 @@
+"""
+Asynchronous, deduplicated crop persistence for detections/.
+
+Instead of one cv2.imwrite per box per frame on the inference thread, each
+track keeps a single crop file per time window. Within the window the file
+is only (re)written when a better crop shows up (higher confidence or larger
+box), and the actual JPEG writes happen on a small background writer pool.
+"""
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+CROP_POLICIES = ("confidence", "area")
+
+
+class CropWriter:
+    """
+    submit() returns the relative path the track's crop lives at for the
+    current window, so CSV rows and UI events always point to the crop that
+    is actually kept on disk; None while the window has no crop because the
+    writer pool was saturated.
+    """
+
+    def __init__(self, base_dir, policy="confidence", window_seconds=2.0, workers=2, max_pending=256):
+        if policy not in CROP_POLICIES:
+            raise ValueError(f"Unknown crop policy: {policy} (expected one of {CROP_POLICIES})")
+        self.base_dir = base_dir
+        self.policy = policy
+        self.window_seconds = float(window_seconds)
+        self.max_pending = max(1, int(max_pending))
+
+        # key -> [window_start, crop_rel, best_score]
+        self._windows = {}
+        # crop_rel -> crop image waiting to be written (latest best wins)
+        self._pending = {}
+        # crop_rel currently being written (one writer per file at a time)
+        self._writing = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._submits = 0
+
+        self.submitted = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            t = threading.Thread(target=self._write_loop, name=f"crop-writer-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def _score(self, conf, x1, y1, x2, y2):
+        if self.policy == "area":
+            return float((x2 - x1) * (y2 - y1))
+        return float(conf) if conf is not None else 0.0
+
+    def submit(self, key, class_name, human_id, frame, box, conf, now=None):
+        """
+        key: unique track key, e.g. (stream_id, class_name, track_id)
+        box: clamped (x1, y1, x2, y2) inside frame
+        """
+        now = time.time() if now is None else now
+        x1, y1, x2, y2 = box
+        score = self._score(conf, x1, y1, x2, y2)
+
+        with self._lock:
+            self.submitted += 1
+            self._submits += 1
+            if self._submits % 500 == 0:
+                self._prune(now)
+
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window_seconds:
+                stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now)) + f"_{int((now % 1) * 1e6):06d}"
+                crop_rel = os.path.join(self.base_dir, class_name, f"{stamp}_{human_id}.jpg")
+                state = self._windows[key] = [now, crop_rel, float("-inf")]
+
+            crop_rel = state[1]
+            if score <= state[2]:
+                return crop_rel
+
+            if crop_rel not in self._pending:
+                if len(self._pending) >= self.max_pending:
+                    # Writer pool is saturated: skip this crop, a later frame may still win.
+                    # Nothing kept for this window yet -> no path to point to.
+                    self.dropped += 1
+                    return crop_rel if state[2] > float("-inf") else None
+                self._queue.put(crop_rel)
+                self.enqueued += 1
+            # Replacing a still-pending crop coalesces both into one write
+            self._pending[crop_rel] = frame[y1:y2, x1:x2].copy()
+            state[2] = score
+            return crop_rel
+
+    def _prune(self, now):
+        expired = [k for k, (start, _, _) in self._windows.items() if now - start >= 2 * self.window_seconds]
+        for k in expired:
+            del self._windows[k]
+
+    def _write_loop(self):
+        while True:
+            crop_rel = self._queue.get()
+            crop = None
+            try:
+                with self._lock:
+                    busy = crop_rel in self._writing
+                    if not busy:
+                        crop = self._pending.pop(crop_rel, None)
+                        if crop is not None:
+                            self._writing.add(crop_rel)
+                if busy:
+                    # Another worker is still writing an older crop to this file
+                    self._queue.put(crop_rel)
+                    time.sleep(0.005)
+                    continue
+                if crop is None:
+                    continue
+                if cv2.imwrite(crop_rel, crop):
+                    self.written += 1
+                else:
+                    self.errors += 1
+            except Exception:
+                self.errors += 1
+            finally:
+                if crop is not None:
+                    with self._lock:
+                        self._writing.discard(crop_rel)
+                self._queue.task_done()
+
+    def flush(self):
+        # Blocks until every queued crop has been written
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+            tracks = len(self._windows)
+        return {
+            "policy": self.policy,
+            "window_seconds": self.window_seconds,
+            "submitted": self.submitted,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": pending,
+            "tracked_windows": tracks,
+        }
@@ -0,0 +1,183 @@
+"""
+Per-client MJPEG delivery profiles.
+
+Every stream client gets an AdaptiveDelivery that caps its frame rate,
+width and JPEG quality. The time each multipart chunk takes to go out (the
+generator is only resumed once the server has written it to the socket) is
+the congestion signal: a send that eats most of the frame interval steps the
+client down the profile ladder, and sustained fast sends step it back up.
+LAN viewers stay on "full", slow WAN viewers settle on a cheaper profile
+instead of building up lag.
+"""
+import threading
+import time
+
+import cv2
+
+# Ordered best -> cheapest; "full" matches the old imencode defaults
+DELIVERY_PROFILES = [
+    {"name": "full", "max_fps": 30, "max_width": None, "quality": 95},
+    {"name": "high", "max_fps": 25, "max_width": 1280, "quality": 80},
+    {"name": "medium", "max_fps": 15, "max_width": 960, "quality": 70},
+    {"name": "low", "max_fps": 10, "max_width": 640, "quality": 60},
+    {"name": "minimal", "max_fps": 5, "max_width": 426, "quality": 50},
+]
+PROFILE_LEVELS = {p["name"]: i for i, p in enumerate(DELIVERY_PROFILES)}
+
+# Share of the frame interval a send may take before stepping down / up
+STEP_DOWN_RATIO = 0.6
+STEP_UP_RATIO = 0.2
+STEP_DOWN_HOLD_S = 1.0
+STEP_UP_HOLD_S = 4.0
+
+# id(delivery) -> AdaptiveDelivery, for /delivery_stats
+_active_deliveries = {}
+_active_lock = threading.Lock()
+
+
+def encode_variant(image, max_width=None, quality=95):
+    """JPEG bytes of `image`, downscaled to `max_width` (keeping aspect) if wider."""
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    if max_width and w > max_width:
+        image = cv2.resize(image, (int(max_width), max(1, round(h * max_width / w))), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        return None
+    return buffer.tobytes()
+
+
+class AdaptiveDelivery:
+    """
+    profile: starting profile name, adaptive=False pins it.
+    Producers call due()/wait_due() (or due_at() ahead of the encode) before
+    picking a frame, variant() for the encode parameters and
+    record(nbytes, seconds) after each send.
+    """
+
+    def __init__(self, name, profile="full", adaptive=True, alpha=0.3):
+        self.name = name
+        self.level = PROFILE_LEVELS.get(profile, 0)
+        self.adaptive = adaptive
+        self.alpha = alpha
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_skipped = 0
+        self.changes = 0
+        self.send_ms = 0.0
+        self.throughput_bps = 0.0
+        self.started_at = time.time()
+
+        self._next_due = 0.0
+        self._interval = 0.0
+        self._last_due_at = None
+        self._last_change = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with _active_lock:
+            _active_deliveries[id(self)] = self
+        return self
+
+    def __exit__(self, *exc):
+        with _active_lock:
+            _active_deliveries.pop(id(self), None)
+
+    @property
+    def profile(self):
+        return DELIVERY_PROFILES[self.level]
+
+    def variant(self):
+        # Cache key / encode parameters for the current profile
+        p = self.profile
+        return p["max_width"], p["quality"]
+
+    def encode(self, image):
+        max_width, quality = self.variant()
+        return encode_variant(image, max_width, quality)
+
+    def due(self):
+        """False when sending now would exceed the profile's max fps (the frame is skipped)."""
+        # Some slack so a source paced at exactly max fps is not thinned by jitter
+        if time.perf_counter() >= self._next_due - 0.2 * self._interval:
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def skip(self, n=1):
+        """Counts `n` frames the client did not get (chosen by the producer, not by due())."""
+        if n > 0:
+            self.frames_skipped += n
+
+    def due_at(self, t):
+        """
+        due() on the source's own clock, for decisions made ahead of sending
+        (before the encode stage): `t` is the frame's position in seconds.
+        """
+        interval = 1.0 / self.profile["max_fps"]
+        if self._last_due_at is None or t >= self._last_due_at + 0.8 * interval:
+            self._last_due_at = t
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def wait_due(self):
+        delay = self._next_due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, nbytes, seconds, started=None):
+        """One chunk of `nbytes` took `seconds` to be written to the client."""
+        now = time.perf_counter()
+        started = now - seconds if started is None else started
+        with self._lock:
+            self.frames_sent += 1
+            self.bytes_sent += nbytes
+            ms = seconds * 1000.0
+            self.send_ms = ms if self.frames_sent == 1 else (1 - self.alpha) * self.send_ms + self.alpha * ms
+            if seconds > 0:
+                bps = nbytes / seconds
+                self.throughput_bps = bps if self.frames_sent == 1 else (1 - self.alpha) * self.throughput_bps + self.alpha * bps
+            interval = self._interval = 1.0 / self.profile["max_fps"]
+            self._next_due = started + interval
+            if self.adaptive:
+                self._adapt(interval, now)
+
+    def _adapt(self, interval, now):
+        send_s = self.send_ms / 1000.0
+        held = now - self._last_change
+        if send_s > STEP_DOWN_RATIO * interval and held >= STEP_DOWN_HOLD_S and self.level < len(DELIVERY_PROFILES) - 1:
+            self.level += 1
+        elif send_s < STEP_UP_RATIO * interval and held >= STEP_UP_HOLD_S and self.level > 0:
+            # The tighter interval of the better profile must still be met
+            better = 1.0 / DELIVERY_PROFILES[self.level - 1]["max_fps"]
+            if send_s >= STEP_UP_RATIO * better:
+                return
+            self.level -= 1
+        else:
+            return
+        self._last_change = now
+        self.changes += 1
+
+    def stats(self):
+        elapsed = time.time() - self.started_at
+        return {
+            "name": self.name,
+            "profile": self.profile["name"],
+            "adaptive": self.adaptive,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "output_fps": round(self.frames_sent / elapsed, 2) if elapsed > 0 else 0.0,
+            "avg_send_ms": round(self.send_ms, 2),
+            "throughput_kbps": round(self.throughput_bps * 8 / 1000, 1),
+            "bytes_sent": self.bytes_sent,
+            "profile_changes": self.changes,
+        }
+
+
+def delivery_stats():
+    with _active_lock:
+        deliveries = list(_active_deliveries.values())
+    return [d.stats() for d in deliveries]
@@ -0,0 +1,71 @@
+"""
+Fixed-capacity ring buffer of UI detection events.
+
+Every event gets a monotonically increasing sequence number ("seq"). Clients
+keep the last seq they saw as a cursor and ask only for newer events, so the
+work per request scales with the number of new events, not with capacity.
+Push subscribers block in wait() until the cursor moves past theirs.
+"""
+import threading
+
+
+class DetectionRing:
+    def __init__(self, capacity=80):
+        self.capacity = max(1, int(capacity))
+        self._slots = [None] * self.capacity
+        self._next_seq = 1
+        self._lock = threading.Condition()
+
+    @property
+    def cursor(self):
+        # seq of the newest event (0 when empty)
+        return self._next_seq - 1
+
+    def append(self, event):
+        """O(1): overwrites the oldest slot once full. Returns the event's seq."""
+        return self.extend([event])
+
+    def extend(self, events):
+        """Appends a batch (e.g. one frame's events) with a single wake-up. Returns the last seq."""
+        with self._lock:
+            for event in events:
+                seq = self._next_seq
+                event["seq"] = seq
+                self._slots[seq % self.capacity] = event
+                self._next_seq = seq + 1
+            if events:
+                self._lock.notify_all()
+            return self._next_seq - 1
+
+    def wait(self, seq, timeout=None):
+        """Blocks until there is something newer than `seq` (or timeout). Returns the cursor."""
+        with self._lock:
+            self._lock.wait_for(lambda: self._next_seq - 1 != int(seq), timeout)
+            return self._next_seq - 1
+
+    def since(self, seq=0, source=None, label=None):
+        """
+        Events with seq > `seq`, oldest first, optionally filtered by source / label.
+        Returns (events, cursor, truncated); truncated means some events newer than
+        `seq` were already overwritten before the client asked for them.
+        A cursor from the future (server restarted) starts over from the oldest event.
+        """
+        seq = int(seq)
+        with self._lock:
+            cursor = self._next_seq - 1
+            if seq > cursor:
+                seq = 0
+            oldest = max(1, self._next_seq - self.capacity)
+            first = max(seq + 1, oldest)
+            truncated = seq + 1 < oldest
+            events = [self._slots[s % self.capacity] for s in range(first, cursor + 1)]
+        if source is not None:
+            events = [e for e in events if e.get("source") == source]
+        if label is not None:
+            events = [e for e in events if e.get("label") == label]
+        return events, cursor, truncated
+
+    def latest(self):
+        # Everything still in the buffer, oldest first
+        events, _, _ = self.since(0)
+        return events
@@ -0,0 +1,392 @@
+"""
+Detection log sinks for server.py.
+
+Rows are buffered in memory and written in batches, either when the buffer
+fills up or every `flush_interval` seconds from a background thread. The
+active file is rotated by size and by age, old files are pruned, and
+query() scans only the files that can overlap the requested time range.
+
+Backends:
+- "csv":    tracking_log.csv (+ tracking_log.<stamp>.csv when rotated)
+- "sqlite": tracking_log.sqlite3 (+ rotated copies), indexed by time, class,
+            human_id and source
+"""
+import csv
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+DETECTION_LOG_COLUMNS = [
+    "timestamp_iso", "source", "frame",
+    "class", "human_id", "track_id",
+    "conf", "x1", "y1", "x2", "y2",
+    "crop_path", "posture_hint", "motion_score", "child_by_scale_hint",
+    "origin"  # "detected" (YOLO ran on the frame) or "propagated" (optical flow)
+]
+
+_INT_COLUMNS = {"frame", "track_id", "x1", "y1", "x2", "y2", "child_by_scale_hint"}
+_FLOAT_COLUMNS = {"conf", "motion_score"}
+
+
+def _typed(column, value):
+    # CSV gives strings back; match what the SQLite backend returns
+    if value == "" or value is None:
+        return None
+    try:
+        if column in _INT_COLUMNS:
+            return int(value)
+        if column in _FLOAT_COLUMNS:
+            return float(value)
+    except (TypeError, ValueError):
+        return value
+    return value
+
+
+class DetectionLogSink:
+    """Buffering, flushing, rotation and retention shared by all backends."""
+
+    extension = ""
+
+    def __init__(self, base_dir, name="tracking_log", batch_size=500, flush_interval=1.0,
+                 max_bytes=256 * 1024 * 1024, max_age_seconds=24 * 3600, keep_files=30):
+        self.base_dir = base_dir
+        self.name = name
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_bytes = int(max_bytes) if max_bytes else 0
+        self.max_age_seconds = float(max_age_seconds) if max_age_seconds else 0.0
+        self.keep_files = int(keep_files) if keep_files else 0
+
+        self.path = os.path.join(base_dir, f"{name}{self.extension}")
+        self._buffer = []
+        self._lock = threading.Lock()       # guards _buffer
+        self._io_lock = threading.Lock()    # guards the open file / connection
+        self._closed = threading.Event()
+        self.rows_written = 0
+        self.rotations = 0
+
+        with self._io_lock:
+            self._open()
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"{name}-flush", daemon=True)
+        self._flusher.start()
+
+    # ---------- backend hooks ----------
+    def _open(self):
+        raise NotImplementedError
+
+    def _close_current(self):
+        raise NotImplementedError
+
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def _current_size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _query_file(self, path, start, end, filters, limit):
+        raise NotImplementedError
+
+    # ---------- public API ----------
+    def write(self, row):
+        """row: list in DETECTION_LOG_COLUMNS order"""
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        # Take the batch under the I/O lock, so concurrent flushes write batches in order
+        with self._io_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if rows:
+                self._write_rows(rows)
+                self.rows_written += len(rows)
+                self._has_rows = True
+            self._maybe_rotate()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        with self._io_lock:
+            self._close_current()
+
+    def query(self, start=None, end=None, class_name=None, human_id=None, source=None, limit=1000):
+        """
+        start/end: ISO timestamps (inclusive), compared as strings like the log stores them.
+        Returns at most `limit` rows as dicts, oldest first.
+        """
+        self.flush()
+        filters = {}
+        if class_name:
+            filters["class"] = str(class_name).strip().lower()
+        if human_id:
+            filters["human_id"] = str(human_id)
+        if source:
+            filters["source"] = str(source)
+
+        out = []
+        file_start = None  # the previous file's end stamp
+        for path, file_end in self._files_in_order():
+            if end and file_start and file_start > end:
+                break  # this and every later file start after the window
+            file_start = file_end or file_start
+            # file_end is rounded down to the second, start may carry milliseconds
+            if start and file_end and file_end < start[:19]:
+                continue  # whole file ends before the window
+            out.extend(self._query_file(path, start, end, filters, limit - len(out)))
+            if len(out) >= limit:
+                break
+        return out
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "backend": type(self).__name__,
+            "path": self.path,
+            "rows_written": self.rows_written,
+            "buffered": buffered,
+            "rotations": self.rotations,
+            "current_bytes": self._current_size(),
+        }
+
+    # ---------- rotation ----------
+    def _rotated_pattern(self):
+        return os.path.join(self.base_dir, f"{self.name}.*{self.extension}")
+
+    def _files_in_order(self):
+        """[(path, end_iso_or_None)] oldest first; rotated names carry their end time."""
+        files = []
+        for path in sorted(glob.glob(self._rotated_pattern())):
+            stamp = os.path.basename(path)[len(self.name) + 1:len(self.name) + 16]
+            try:
+                end = time.strftime("%Y-%m-%dT%H:%M:%S", time.strptime(stamp, "%Y%m%d_%H%M%S"))
+            except ValueError:
+                continue
+            files.append((path, end))
+        files.append((self.path, None))
+        return files
+
+    def _maybe_rotate(self):
+        too_big = self.max_bytes and self._current_size() >= self.max_bytes
+        too_old = self.max_age_seconds and time.time() - self._opened_at >= self.max_age_seconds
+        if not (too_big or too_old) or not self._has_rows:
+            return
+        self._close_current()
+        os.replace(self.path, self._rotated_path())
+        self.rotations += 1
+        self._prune_rotated()
+        self._open()
+
+    def _rotated_path(self):
+        # time.time(), like the rows' datetime.now(): a bare strftime() reads the coarse
+        # time(NULL) clock, which can still show the previous second
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(time.time()))
+        # Several rotations within one second get increasing numeric suffixes
+        prefix = os.path.join(self.base_dir, f"{self.name}.{stamp}")
+        same_second = glob.glob(f"{prefix}*{self.extension}")
+        if not same_second:
+            return f"{prefix}{self.extension}"
+        suffixes = [p[len(prefix):-len(self.extension)] for p in same_second]
+        n = max(int(x) if x.isdigit() else 0 for x in suffixes) + 1
+        return f"{prefix}{n:02d}{self.extension}"
+
+    def _prune_rotated(self):
+        if not self.keep_files:
+            return
+        rotated = sorted(glob.glob(self._rotated_pattern()))
+        for path in rotated[:-self.keep_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] Detection log flush failed: {e}")
+
+
+class CsvLogSink(DetectionLogSink):
+    extension = ".csv"
+
+    def _open(self):
+        # A log written with an older column set is rotated away first
+        if self._current_size() > 0 and self._read_header(self.path) != DETECTION_LOG_COLUMNS:
+            os.replace(self.path, self._rotated_path())
+        # Append, so a restart no longer truncates the log
+        new_file = self._current_size() == 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(DETECTION_LOG_COLUMNS)
+            self._file.flush()
+        self._has_rows = not new_file
+        self._opened_at = time.time()
+
+    @staticmethod
+    def _read_header(path):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                return next(csv.reader(f), None)
+        except OSError:
+            return None
+
+    def _close_current(self):
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+    def _write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _query_file(self, path, start, end, filters, limit):
+        out = []
+        if limit <= 0:
+            return out
+        try:
+            f = open(path, newline="", encoding="utf-8")
+        except OSError:
+            return out
+        with f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return out
+            col = {name: i for i, name in enumerate(header)}
+            ts_i = col["timestamp_iso"]
+            class_i = col.get("class")
+            checks = [(col[k], v) for k, v in filters.items() if k in col]
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                ts = row[ts_i]
+                if start and ts < start:
+                    continue
+                if end and ts > end:
+                    continue
+                if any((row[i].lower() if i == class_i else row[i]) != v for i, v in checks):
+                    continue
+                out.append({name: _typed(name, row[i]) for name, i in col.items()})
+                if len(out) >= limit:
+                    break
+        return out
+
+
+class SqliteLogSink(DetectionLogSink):
+    extension = ".sqlite3"
+
+    _CREATE = (
+        "CREATE TABLE IF NOT EXISTS detections ("
+        "timestamp_iso TEXT, source TEXT, frame INTEGER, "
+        "class TEXT, human_id TEXT, track_id INTEGER, "
+        "conf REAL, x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER, "
+        "crop_path TEXT, posture_hint TEXT, motion_score REAL, child_by_scale_hint INTEGER, "
+        "origin TEXT)"
+    )
+    # Columns added after the first release: (name, type), added to older files on open
+    _ADDED_COLUMNS = (("origin", "TEXT"),)
+    _INDEXES = (
+        "CREATE INDEX IF NOT EXISTS idx_det_time ON detections (timestamp_iso)",
+        "CREATE INDEX IF NOT EXISTS idx_det_class_time ON detections (class, timestamp_iso)",
+        "CREATE INDEX IF NOT EXISTS idx_det_human ON detections (human_id)",
+        "CREATE INDEX IF NOT EXISTS idx_det_source_time ON detections (source, timestamp_iso)",
+    )
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self._CREATE)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(detections)")}
+        for column, column_type in self._ADDED_COLUMNS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE detections ADD COLUMN {column} {column_type}")
+        for stmt in self._INDEXES:
+            self._conn.execute(stmt)
+        self._conn.commit()
+        self._has_rows = self._conn.execute("SELECT EXISTS (SELECT 1 FROM detections)").fetchone()[0] == 1
+        self._opened_at = time.time()
+
+    def _current_size(self):
+        # Recent rows may still sit in the write-ahead log
+        size = 0
+        for path in (self.path, self.path + "-wal"):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def _close_current(self):
+        try:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+        except Exception:
+            pass
+
+    def _write_rows(self, rows):
+        placeholders = ", ".join("?" * len(DETECTION_LOG_COLUMNS))
+        self._conn.executemany(
+            f"INSERT INTO detections ({', '.join(DETECTION_LOG_COLUMNS)}) VALUES ({placeholders})",
+            [[None if v == "" else v for v in row] for row in rows]
+        )
+        self._conn.commit()
+
+    def _query_file(self, path, start, end, filters, limit):
+        if limit <= 0:
+            return []
+        where, params = [], []
+        if start:
+            where.append("timestamp_iso >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp_iso <= ?")
+            params.append(end)
+        for column, value in filters.items():
+            # Classes are lower-cased on write, so the (class, time) index applies
+            where.append(f'"{column}" = ?')
+            params.append(value)
+        sql = "SELECT * FROM detections"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp_iso LIMIT ?"
+        params.append(limit)
+
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        except sqlite3.Error:
+            return []
+        try:
+            cur = conn.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+        except sqlite3.Error:
+            return []
+        finally:
+            conn.close()
+
+
+LOG_BACKENDS = {
+    "csv": CsvLogSink,
+    "sqlite": SqliteLogSink,
+}
+
+
+def create_log_sink(backend, base_dir, **kwargs):
+    try:
+        sink_cls = LOG_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown detection log backend: {backend} (expected one of {sorted(LOG_BACKENDS)})")
+    return sink_cls(base_dir, **kwargs)
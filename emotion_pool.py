@@ -0,0 +1,151 @@
+"""
+Bounded worker pool for the emotion analysis in fixed_colab.py.
+
+A fixed number of worker threads share one analyze_batch() function
+(DeepFace, whose models are loaded once at startup). Each worker takes up
+to `max_batch` sessions' frames at once, so crops from many sessions go
+through the classifier in one call. Work is keyed by session:
+
+- at most one analysis per session is in flight at a time,
+- a session has at most one queued frame; a newer submit replaces it
+  (the stale frame is dropped, never analyzed),
+- sessions are served round-robin, so a busy session cannot starve others.
+
+Results are handed to the submitter's callback in submission order per
+session, so session state is never overwritten by an older analysis.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Latency / queue-wait samples kept for the stats averages and percentiles
+STATS_WINDOW = 200
+
+
+class EmotionPool:
+    def __init__(self, analyze_batch, workers=2, max_batch=16, name="emotion"):
+        # analyze_batch(list of frames) -> list of results, same order
+        self.analyze_batch = analyze_batch
+        self.workers = max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._pending = {}   # key -> (frame, on_result, submitted_at)
+        self._ready = deque()  # keys with a pending frame and nothing in flight
+        self._in_flight = set()
+        self._busy = 0  # workers inside analyze_batch()
+        self._closed = False
+
+        self.submitted = 0
+        self.replaced = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self._waits = deque(maxlen=STATS_WINDOW)
+        self._latencies = deque(maxlen=STATS_WINDOW)
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key, frame, on_result):
+        """Queues `frame` for `key`; replaces a frame of `key` that has not started yet."""
+        with self._cond:
+            if self._closed:
+                return
+            self.submitted += 1
+            if key in self._pending:
+                self.replaced += 1
+            elif key not in self._in_flight:
+                self._ready.append(key)
+            self._pending[key] = (frame, on_result, time.perf_counter())
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                jobs = []
+                while self._ready and len(jobs) < self.max_batch:
+                    key = self._ready.popleft()
+                    jobs.append((key, *self._pending.pop(key)))
+                    self._in_flight.add(key)
+                self._busy += 1
+
+            started = time.perf_counter()
+            try:
+                results = self.analyze_batch([frame for _, frame, _, _ in jobs])
+            except Exception as e:
+                print(f"[WARN] {self.name} analysis failed: {e}")
+                results = None
+            if results is not None:
+                for (_, _, on_result, _), result in zip(jobs, results):
+                    on_result(result)
+            finished = time.perf_counter()
+
+            with self._cond:
+                self._busy -= 1
+                for key, _, _, submitted_at in jobs:
+                    self._in_flight.discard(key)
+                    # A newer frame arrived while this one ran
+                    if key in self._pending:
+                        self._ready.append(key)
+                        self._cond.notify()
+                    self._waits.append(started - submitted_at)
+                if results is not None:
+                    self.completed += len(jobs)
+                else:
+                    self.failed += len(jobs)
+                self.batches += 1
+                self._latencies.append(finished - started)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._ready.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            busy = self._busy
+            in_flight = len(self._in_flight)
+            queued = len(self._pending)
+            waits = np.array(self._waits, dtype=float) * 1000
+            latencies = np.array(self._latencies, dtype=float) * 1000
+            counts = {
+                "submitted": self.submitted,
+                "replaced": self.replaced,
+                "completed": self.completed,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch_size": round((self.completed + self.failed) / self.batches, 2) if self.batches else 0.0,
+            }
+
+        def ms(values, q):
+            return round(float(np.percentile(values, q)), 1) if len(values) else 0.0
+
+        return {
+            "workers": self.workers,
+            "max_batch": self.max_batch,
+            "busy_workers": busy,
+            "in_flight_sessions": in_flight,
+            "queued_sessions": queued,
+            # Busy share of the pool; 1.0 with a queue means analyses fall behind
+            "saturation": round(busy / self.workers, 3),
+            **counts,
+            "queue_wait_ms": {"avg": round(float(waits.mean()), 1) if len(waits) else 0.0,
+                              "p95": ms(waits, 95), "max": ms(waits, 100)},
+            # Per batch (one analyze_batch call)
+            "latency_ms": {"avg": round(float(latencies.mean()), 1) if len(latencies) else 0.0,
+                           "p95": ms(latencies, 95), "max": ms(latencies, 100)},
+        }
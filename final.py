@@ -1,9 +1,11 @@
-from ultralytics import YOLO
 import cv2
+import os
 import sys
 
-# Load trained model
-model = YOLO("best.pt")
+from model_backend import load_detector
+
+# Load trained model (MODEL_BACKEND=onnx / onnx-int8 / openvino / openvino-int8 for the CPU backends)
+model = load_detector("best.pt", backend=os.environ.get("MODEL_BACKEND", "torch"), imgsz=640)
 
 # Check command line arguments
 if len(sys.argv) > 1:
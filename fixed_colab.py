@@ -5,14 +5,13 @@ import pandas as pd
 import joblib
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from collections import Counter
 import uuid
 import base64
-import io
 import json
+import struct
 import sys
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
@@ -21,6 +20,12 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
 from ws_ping import ConnectionManager
+from emotion_pool import EmotionPool
+from frame_mailbox import AdaptiveSkip, FrameMailbox
+from behavior_rules import LandmarkFeatures, evaluate_rules, landmarks_array
+from movement import MovementIntensity
+from session_history import SessionHistory
+from graphs import GRAPH_MAX_POINTS, graph_series, render_graphs
 import time
 import faulthandler
 faulthandler.enable()
@@ -79,56 +84,165 @@ app.add_middleware(
 )
 
 # === Frame skipping for optimization ===
+# Initial skip ratio; it then follows the measured frame latency (frame_mailbox.AdaptiveSkip)
 FRAME_SKIP = 2  
+TARGET_LATENCY_MS = float(os.environ.get("TARGET_LATENCY_MS", 150))
+MAX_FRAME_SKIP = int(os.environ.get("MAX_FRAME_SKIP", 6))
+
+# === Frame processing pool ===
+# Decode, MediaPipe, drawing and JPEG/base64 encode run here instead of on the
+# event loop (OpenCV and MediaPipe release the GIL, so sessions use all cores).
+FRAME_WORKERS = int(os.environ.get("FRAME_WORKERS", os.cpu_count() or 4))
+FRAME_POOL = ThreadPoolExecutor(max_workers=FRAME_WORKERS, thread_name_prefix="frame")
+
+# === Binary frame protocol ===
+# Alternative to data URLs over text messages. Each binary message is a fixed
+# 32-byte little-endian header followed by raw JPEG bytes:
+#   magic "BT" | version u8 | flags u8 | frame id u32 | timestamp f64 (client ms) | session uuid 16 bytes
+# The server answers a frame with the same header (frame id and timestamp
+# echoed) + the annotated JPEG, then a compact JSON text message
+# {"type": "result", "frameId": ..., "behavior": ..., ...}.
+FRAME_HEADER = struct.Struct("<2sBBId16s")
+FRAME_MAGIC = b"BT"
+FRAME_VERSION = 1
+FLAG_WANT_FRAME = 0x01  # client wants the annotated frame back, not only the result
+
+def session_uuid_bytes(session_id):
+    """16-byte form of a session id for the binary header (empty if not a UUID)"""
+    try:
+        return uuid.UUID(session_id).bytes
+    except ValueError:
+        return b""
 
 # === YOUR HELPER FUNCTIONS ===
-def calculate_angle(a, b, c):
-    """Calculates the angle at point b given three points [x, y]"""
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    if angle > 180.0:
-        angle = 360-angle
-    return angle
-
-def analyze_emotion_task(session_obj, img):
-    """Background task for DeepFace"""
-    if not DEEPFACE_AVAILABLE: return
 
-    try:
-        # Run analysis (silently, no enforcement)
-        objs = DeepFace.analyze(img_path=img, actions=['emotion'], enforce_detection=False, silent=True)
-        
-        if isinstance(objs, dict): objs = [objs]
-            
-        temp_data = []
-        if objs:
-            # Update main emotion
-            session_obj.current_emotion = objs[0]['dominant_emotion']
-            # Store data for bounding boxes
-            for obj in objs:
-                region = obj['region']
-                x, y, w, h = region['x'], region['y'], region['w'], region['h']
-                emotion = obj['dominant_emotion']
-                temp_data.append({'box': (x, y, w, h), 'emotion': emotion})
-        
-        session_obj.faces_data = temp_data
-    except Exception:
-        pass
+def analyze_emotion(img):
+    """Runs DeepFace on one frame; returns (main emotion or None, face boxes)"""
+    # Run analysis (silently, no enforcement)
+    objs = DeepFace.analyze(img_path=img, actions=['emotion'], enforce_detection=False, silent=True)
+
+    if isinstance(objs, dict): objs = [objs]
+
+    temp_data = []
+    for obj in objs or []:
+        region = obj['region']
+        x, y, w, h = region['x'], region['y'], region['w'], region['h']
+        emotion = obj['dominant_emotion']
+        temp_data.append({'box': (x, y, w, h), 'emotion': emotion})
+    return (objs[0]['dominant_emotion'] if objs else None), temp_data
+
+# --- Emotion from Holistic face crops ---
+# Holistic has already located the face, so only DeepFace's emotion
+# classifier runs (48x48 grayscale crops, batched across sessions) instead of
+# DeepFace.analyze() with its own face detector on the whole frame.
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+FACE_CROP_SIZE = 48
+FACE_MARGIN = 0.15  # extra share around the landmark box
+_emotion_classifier = None
+_emotion_classifier_lock = threading.Lock()
+
+def emotion_classifier():
+    """DeepFace's Keras emotion model, built once"""
+    global _emotion_classifier
+    with _emotion_classifier_lock:
+        if _emotion_classifier is None:
+            try:
+                model = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+            except TypeError:
+                # Older DeepFace: build_model(model_name)
+                model = DeepFace.build_model("Emotion")
+            _emotion_classifier = getattr(model, "model", model)
+        return _emotion_classifier
+
+def face_box(face, width, height, margin=FACE_MARGIN):
+    """Square (x, y, w, h) pixel box around the face landmark array, or None if empty"""
+    pts = face[:, :2]
+    (x1, y1), (x2, y2) = pts.min(axis=0), pts.max(axis=0)
+    cx, cy = (x1 + x2) / 2 * width, (y1 + y2) / 2 * height
+    half = max((x2 - x1) * width, (y2 - y1) * height) * (1 + margin) / 2
+    left, top = int(max(0, cx - half)), int(max(0, cy - half))
+    right, bottom = int(min(width, cx + half)), int(min(height, cy + half))
+    if right - left < 2 or bottom - top < 2:
+        return None
+    return (left, top, right - left, bottom - top)
+
+def face_crop(frame, box):
+    """Normalized grayscale crop, as DeepFace's emotion model expects it"""
+    x, y, w, h = box
+    gray = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (FACE_CROP_SIZE, FACE_CROP_SIZE), interpolation=cv2.INTER_AREA)
+    return (gray.astype(np.float32) / 255.0)[:, :, None]
+
+def analyze_emotions(jobs):
+    """
+    Emotion pool batch: ("crop", crop, box) jobs go through the classifier in
+    one call, ("frame", frame) jobs (no MediaPipe) through DeepFace.analyze.
+    """
+    results = [None] * len(jobs)
+    crops = [i for i, job in enumerate(jobs) if job[0] == "crop"]
+    if crops:
+        batch = np.stack([jobs[i][1] for i in crops])
+        probs = np.asarray(emotion_classifier()(batch, training=False))
+        for i, p in zip(crops, probs):
+            emotion = EMOTION_LABELS[int(np.argmax(p))]
+            results[i] = (emotion, [{'box': jobs[i][2], 'emotion': emotion}])
+    for i, job in enumerate(jobs):
+        if job[0] == "frame":
+            results[i] = analyze_emotion(job[1])
+    return results
+
+def apply_emotion(session_obj, result):
+    """Pool callback: store the latest analysis on the session"""
+    emotion, faces = result
+    if emotion:
+        # Update main emotion
+        session_obj.current_emotion = emotion
+    # Store data for bounding boxes
+    session_obj.faces_data = faces
+
+def preload_emotion_model():
+    """Loads the DeepFace emotion model (and face detector) once, before the first session"""
+    started = time.perf_counter()
+    if MEDIAPIPE_AVAILABLE:
+        analyze_emotions([("crop", np.zeros((FACE_CROP_SIZE, FACE_CROP_SIZE, 1), dtype=np.float32), (0, 0, 1, 1))])
+    else:
+        analyze_emotion(np.zeros((224, 224, 3), dtype=np.uint8))
+    print(f"[INFO] DeepFace emotion model loaded in {time.perf_counter() - started:.2f}s")
+
+# === Emotion worker pool ===
+# Fixed number of DeepFace workers; one analysis in flight per session and a
+# newer frame replaces a session's queued one (see emotion_pool.py).
+EMOTION_WORKERS = int(os.environ.get("EMOTION_WORKERS", 2))
+EMOTION_MAX_BATCH = int(os.environ.get("EMOTION_MAX_BATCH", 16))
+# Processed frames between analyses; face crops are cheap, whole frames are not
+EMOTION_EVERY_N_FRAMES = int(os.environ.get("EMOTION_EVERY_N_FRAMES", 5 if MEDIAPIPE_AVAILABLE else 15))
+emotion_pool = EmotionPool(analyze_emotions, workers=EMOTION_WORKERS,
+                           max_batch=EMOTION_MAX_BATCH) if DEEPFACE_AVAILABLE else None
 
 # === Data Storage ===
+# Per-session history caps: scores kept for the last SESSION_MAX_FRAMES
+# processed frames, the behavior timeline for the last SESSION_MAX_RUNS runs
+SESSION_MAX_FRAMES = int(os.environ.get("SESSION_MAX_FRAMES", 54000))
+SESSION_MAX_RUNS = int(os.environ.get("SESSION_MAX_RUNS", 10000))
+# How long a disconnected session stays available for /generate-graphs
+SESSION_RETENTION_SECONDS = float(os.environ.get("SESSION_RETENTION_SECONDS", 300))
+
 class SessionData:
     def __init__(self):
-        self.prediction_history = []
-        self.movement_scores_raw = []
-        self.smoothed_scores = []
-        self.frame_count = 0
+        # Behaviors (RLE codes) and movement scores, capped (session_history.py)
+        self.history = SessionHistory(SESSION_MAX_FRAMES, SESSION_MAX_RUNS)
+        self.graph_cache = {}  # format -> (history version, graph data)
+        self.graph_renders = {}  # format -> (history version, render task in flight)
+        self.connected = True
+        self.frame_count = 0  # frames received
+        self.processed_frames = 0
         self.FRAME_RATE = 30 
+        self.started = time.perf_counter()
+        # Landmark-velocity EMA with running average / peak (movement.py)
+        self.movement = MovementIntensity()
         
         # --- NEW VARIABLES ---
-        self.detect_every_n_frames = 15
+        self.detect_every_n_frames = EMOTION_EVERY_N_FRAMES
         self.current_emotion = "Neutral"
         self.faces_data = [] 
         self.mouth_status = ""
@@ -142,8 +256,18 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.on_event("startup")
 async def startup_event():
+    if DEEPFACE_AVAILABLE:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, preload_emotion_model)
+        except Exception as e:
+            print(f"[WARN] DeepFace preload failed: {e}")
     print("🚀 Body Tracking AI Server is ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if emotion_pool:
+        emotion_pool.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def get():
     with open('static/index.html', 'r') as f:
@@ -153,6 +277,199 @@ async def get():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/sessions/stats")
+async def sessions_stats():
+    per_session = {
+        sid: {"connected": s.connected, **s.history.stats()}
+        for sid, s in list(sessions.items())
+    }
+    return {
+        "sessions": per_session,
+        "session_count": len(per_session),
+        "connected": sum(1 for s in per_session.values() if s["connected"]),
+        "total_history_bytes": sum(s["history_bytes"] for s in per_session.values()),
+        "limits": {
+            "max_frames": SESSION_MAX_FRAMES,
+            "max_runs": SESSION_MAX_RUNS,
+            "retention_seconds": SESSION_RETENTION_SECONDS,
+        },
+    }
+
+@app.get("/emotion_stats")
+async def emotion_stats():
+    if not emotion_pool:
+        return {"available": False}
+    return {"available": True, **emotion_pool.stats()}
+
+# === Frame Processing (worker pool) ===
+def create_holistic():
+    # Initialize Holistic with HIGHER CONFIDENCE to reduce false results
+    if not MEDIAPIPE_AVAILABLE:
+        return None
+    return mp.solutions.holistic.Holistic(
+        min_detection_confidence=0.6,
+        min_tracking_confidence=0.6
+    )
+
+def close_holistic(holistic):
+    if MEDIAPIPE_AVAILABLE and holistic:
+        holistic.close()
+
+def process_frame(session, holistic, img_bytes):
+    """
+    CPU part of one WebSocket frame: decode, MediaPipe, drawing, encode.
+    Runs in FRAME_POOL. Returns (result dict, annotated JPEG bytes), or
+    None if the frame is skipped or cannot be decoded.
+    """
+    # Decode Image
+    nparr = np.frombuffer(img_bytes, np.uint8)
+    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if frame is None: return None
+
+    session.processed_frames += 1
+
+    # Resize and Prep
+    frame = cv2.resize(frame, (640, 480), interpolation=cv2.INTER_AREA)
+    frame = cv2.flip(frame, 1)
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    active_statuses = []
+    session.mouth_status = ""
+
+    # --- 1. MEDIA PIPE LOGIC (Calculations ONLY, NO DRAWING) ---
+    # Landmarks -> arrays once; behaviors are rules in behavior_rules.py
+    pose = face = None
+    if MEDIAPIPE_AVAILABLE and holistic:
+        results = holistic.process(rgb_frame)
+        pose = landmarks_array(results.pose_landmarks)
+        face = landmarks_array(results.face_landmarks)
+
+        matched = evaluate_rules(LandmarkFeatures(pose, face, session.current_emotion))
+        active_statuses = matched["body"]
+        session.mouth_status = matched["mouth"]
+
+    # --- 2. DEEPFACE LOGIC (Emotion Pool) ---
+    if emotion_pool and session.processed_frames % session.detect_every_n_frames == 0:
+        job = None
+        if MEDIAPIPE_AVAILABLE and holistic:
+            # Face crop from the landmarks; no face -> drop the old boxes
+            box = face_box(face, frame.shape[1], frame.shape[0]) if face is not None else None
+            if box:
+                job = ("crop", face_crop(frame, box), box)
+            else:
+                session.faces_data = []
+        else:
+            job = ("frame", frame.copy())
+        if job:
+            emotion_pool.submit(session, job, lambda result: apply_emotion(session, result))
+
+    # --- 3. VISUALIZATION (Boxes & Text ONLY) ---
+
+    # Draw Status Text (Hands/Standing)
+    y_pos = 50
+    for status in active_statuses:
+        color = (0, 255, 0) # Green
+        if status == "STANDING": color = (255, 255, 0)
+        cv2.putText(frame, status, (20, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        y_pos += 40
+
+    # Draw Emotion Boxes (Faces)
+    for face in session.faces_data:
+        (x, y, w, h) = face['box']
+        emotion_label = face['emotion']
+
+        color_emo = (0, 255, 0)
+        if emotion_label in ["angry", "sad", "fear"]:
+            color_emo = (0, 0, 255)
+
+        cv2.rectangle(frame, (x, y), (x+w, y+h), color_emo, 2)
+        cv2.putText(frame, emotion_label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color_emo, 2)
+
+    if session.mouth_status == "SHOUTING":
+        cv2.putText(frame, "!!! SHOUTING !!!", (20, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+    # Prepare Response Data
+    if active_statuses:
+        main_behavior = active_statuses[0]
+    elif session.mouth_status == "SHOUTING":
+        main_behavior = "SHOUTING"
+    else:
+        main_behavior = session.current_emotion
+
+    raw_score, movement_score = session.movement.update(pose, time.perf_counter() - session.started)
+    session.history.append(main_behavior, raw_score, movement_score)
+
+    # Compress
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+    _, buffer = cv2.imencode('.jpg', frame, encode_params)
+
+    result = {
+        "behavior": main_behavior,
+        "confidence": 1.0,
+        "movementScore": round(movement_score, 3),
+        "mediapipeAvailable": MEDIAPIPE_AVAILABLE,
+        "modelAvailable": True
+    }
+    return result, buffer.tobytes()
+
+def process_text_frame(session, holistic, data):
+    """Text protocol: data:image/jpeg;base64 URL in, analysis_data JSON with the frame inlined out"""
+    if "," in data and ";base64," in data:
+        img_bytes = base64.b64decode(data.split(",")[1])
+    else:
+        return None
+    processed = process_frame(session, holistic, img_bytes)
+    if processed is None: return None
+
+    result, jpeg = processed
+    img_str = base64.b64encode(jpeg).decode('utf-8')
+    return {"processedFrame": f"data:image/jpeg;base64,{img_str}", **result}
+
+def parse_frame_header(payload, session_tag):
+    """(flags, frame_id, timestamp, tag) of a valid binary frame for this session, else None"""
+    if len(payload) <= FRAME_HEADER.size: return None
+    magic, version, flags, frame_id, timestamp, tag = FRAME_HEADER.unpack_from(payload)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION: return None
+    # Frames tagged for another session are not ours
+    if session_tag and tag != session_tag: return None
+    return flags, frame_id, timestamp, tag
+
+def process_binary_frame(session, holistic, header, payload):
+    """Binary protocol: header + JPEG in; (header + annotated JPEG, compact result) out"""
+    flags, frame_id, timestamp, tag = header
+    processed = process_frame(session, holistic, memoryview(payload)[FRAME_HEADER.size:])
+    if processed is None: return None
+
+    result, jpeg = processed
+    result.update({"type": "result", "frameId": frame_id, "timestamp": timestamp})
+    if not flags & FLAG_WANT_FRAME:
+        return None, result
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, frame_id, timestamp, tag)
+    return header + jpeg, result
+
+async def read_frames(websocket, session, mailbox, session_tag):
+    """Reader task: moves incoming frames into the session mailbox (newest wins)"""
+    try:
+        while True:
+            message = await asyncio.wait_for(websocket.receive(), timeout=60.0)
+            if message["type"] == "websocket.disconnect": break
+
+            if message.get("bytes") is not None:
+                # Invalid or foreign frames never reach the mailbox or the skip ratio
+                header = parse_frame_header(message["bytes"], session_tag)
+                if header is None: continue
+                item = ("bytes", (header, message["bytes"]), time.perf_counter())
+            else:
+                data = message.get("text")
+                if not data or data == 'pong' or data.startswith('{'): continue
+                item = ("text", data, time.perf_counter())
+            session.frame_count += 1
+            mailbox.put(item)
+    except Exception:
+        pass
+    finally:
+        mailbox.close()
+
 # === WebSocket Endpoint ===
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -178,177 +495,82 @@ async def websocket_endpoint(websocket: WebSocket):
     
     sessions[session_id] = SessionData()
     session = sessions[session_id]
-    
-    # Initialize Holistic with HIGHER CONFIDENCE to reduce false results
-    holistic = None
-    if MEDIAPIPE_AVAILABLE:
-        holistic = mp.solutions.holistic.Holistic(
-            min_detection_confidence=0.6, 
-            min_tracking_confidence=0.6
-        )
+    session_tag = session_uuid_bytes(session_id)
+    loop = asyncio.get_running_loop()
 
+    # Reader task -> size-1 mailbox -> this loop, which always takes the newest frame
+    mailbox = FrameMailbox()
+    skipper = AdaptiveSkip(TARGET_LATENCY_MS / 1000, initial=FRAME_SKIP, max_skip=MAX_FRAME_SKIP)
+    reader = asyncio.create_task(read_frames(websocket, session, mailbox, session_tag))
+
+    # One Holistic graph per session (it keeps tracking state between frames).
+    # Frames are awaited one at a time, so a session's graph is never used
+    # by two workers at once.
+    holistic = None
     try:
+        holistic = await loop.run_in_executor(FRAME_POOL, create_holistic)
+
+        dropped_seen = 0
         while True:            
+            item = await mailbox.get()
+            if item is None: break
+            kind, payload, arrived = item
+            # Frames the mailbox already dropped count as the skip for this one
+            throttled = mailbox.dropped > dropped_seen
+            dropped_seen = mailbox.dropped
+            if not skipper.should_process(throttled): continue
+
+            if kind == "bytes":
+                # Binary protocol: header + JPEG both ways, compact JSON result
+                header, payload = payload
+                processed = await loop.run_in_executor(
+                    FRAME_POOL, process_binary_frame, session, holistic, header, payload)
+                if processed is None: continue
+                frame_bytes, analysis_data = processed
+            else:
+                # Text protocol (data URL in, processedFrame data URL out)
+                frame_bytes = None
+                analysis_data = await loop.run_in_executor(FRAME_POOL, process_text_frame, session, holistic, payload)
+                if analysis_data is None: continue
+
+            analysis_data["frameCount"] = session.frame_count
+            analysis_data["droppedFrames"] = mailbox.dropped
+            analysis_data.update(skipper.stats())
             try:
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=60.0)
-                if not data or data == 'pong' or data.startswith('{'): continue
-                
-                # Decode Image
-                if "," in data and ";base64," in data:
-                    img_data = data.split(",")[1]
-                    img_bytes = base64.b64decode(img_data)
-                    nparr = np.frombuffer(img_bytes, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    if frame is None: continue
-                else:
-                    continue
-
-                session.frame_count += 1
-                if session.frame_count % FRAME_SKIP != 0: continue
-                
-                # Resize and Prep
-                frame = cv2.resize(frame, (640, 480), interpolation=cv2.INTER_AREA)
-                frame = cv2.flip(frame, 1)
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                active_statuses = [] 
-                session.mouth_status = ""
-
-                # --- 1. MEDIA PIPE LOGIC (Calculations ONLY, NO DRAWING) ---
-                if MEDIAPIPE_AVAILABLE and holistic:
-                    results = holistic.process(rgb_frame)
-
-                    if results.pose_landmarks:
-                        # NOTE: WE DELETED THE DRAWING CODE HERE TO REDUCE DELAY
-                        
-                        landmarks = results.pose_landmarks.landmark
-                        mp_pose = mp.solutions.holistic.PoseLandmark
-                        
-                        # --- Logic A: Hands Up ---
-                        right_wrist = landmarks[mp_pose.RIGHT_WRIST]
-                        right_eye = landmarks[mp_pose.RIGHT_EYE]
-                        left_wrist = landmarks[mp_pose.LEFT_WRIST]
-                        left_eye = landmarks[mp_pose.LEFT_EYE]
-                        
-                        # Added visibility check to prevent false positives when hand is off-screen
-                        if right_wrist.visibility > 0.5 and right_eye.visibility > 0.5:
-                            if right_wrist.y < right_eye.y:
-                                active_statuses.append("RIGHT HAND UP")
-                        
-                        if left_wrist.visibility > 0.5 and left_eye.visibility > 0.5:
-                            if left_wrist.y < left_eye.y:
-                                active_statuses.append("LEFT HAND UP")
-
-                        # --- Logic B: Standing ---
-                        # Indices: 23=Hip, 25=Knee, 27=Ankle
-                        if landmarks[25].visibility > 0.6 and landmarks[27].visibility > 0.6:
-                            l_hip = [landmarks[23].x, landmarks[23].y]
-                            l_knee = [landmarks[25].x, landmarks[25].y]
-                            l_ankle = [landmarks[27].x, landmarks[27].y]
-                            
-                            knee_angle = calculate_angle(l_hip, l_knee, l_ankle)
-                            
-                            if knee_angle > 160:
-                                active_statuses.append("STANDING")
-                            elif knee_angle < 140:
-                                active_statuses.append("SITTING")
-                    
-                    # --- Logic C: Shouting (Mouth) ---
-                    if results.face_landmarks:
-                        face_lm = results.face_landmarks.landmark
-                        # Lips: 13=Upper, 14=Lower
-                        upper_lip = face_lm[13]
-                        lower_lip = face_lm[14]
-                        
-                        # Only check if lips are detected
-                        if upper_lip.visibility > 0.5 and lower_lip.visibility > 0.5:
-                            mouth_open_dist = abs(upper_lip.y - lower_lip.y)
-                            if mouth_open_dist > 0.05:
-                                if session.current_emotion in ["angry", "fear", "surprise"]:
-                                    session.mouth_status = "SHOUTING"
-                                else:
-                                    session.mouth_status = "Mouth Open"
-
-                # --- 2. DEEPFACE LOGIC (Background Thread) ---
-                if session.frame_count % session.detect_every_n_frames == 0:
-                    threading.Thread(target=analyze_emotion_task, args=(session, frame.copy())).start()
-
-                # --- 3. VISUALIZATION (Boxes & Text ONLY) ---
-                
-                # Draw Status Text (Hands/Standing)
-                y_pos = 50
-                for status in active_statuses:
-                    color = (0, 255, 0) # Green
-                    if status == "STANDING": color = (255, 255, 0)
-                    cv2.putText(frame, status, (20, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
-                    y_pos += 40
-
-                # Draw Emotion Boxes (Faces)
-                for face in session.faces_data:
-                    (x, y, w, h) = face['box']
-                    emotion_label = face['emotion']
-                    
-                    color_emo = (0, 255, 0)
-                    if emotion_label in ["angry", "sad", "fear"]:
-                        color_emo = (0, 0, 255)
-                    
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), color_emo, 2)
-                    cv2.putText(frame, emotion_label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color_emo, 2)
-
-                if session.mouth_status == "SHOUTING":
-                    cv2.putText(frame, "!!! SHOUTING !!!", (20, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-                # Prepare Response Data
-                if active_statuses:
-                    main_behavior = active_statuses[0]
-                elif session.mouth_status == "SHOUTING":
-                    main_behavior = "SHOUTING"
-                else:
-                    main_behavior = session.current_emotion
-
-                session.prediction_history.append(main_behavior)
-                # Add random fake score for graph continuity
-                session.smoothed_scores.append(np.random.rand() * 10 if active_statuses else 0)
-
-                # Compress and Send
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
-                _, buffer = cv2.imencode('.jpg', frame, encode_params)
-                img_str = base64.b64encode(buffer).decode('utf-8')
-                
-                analysis_data = {
-                    "processedFrame": f"data:image/jpeg;base64,{img_str}",
-                    "behavior": main_behavior,
-                    "confidence": 1.0,
-                    "movementScore": 0.5,
-                    "frameCount": session.frame_count,
-                    "mediapipeAvailable": MEDIAPIPE_AVAILABLE,
-                    "modelAvailable": True
-                }
-                
-                try:
-                    await asyncio.wait_for(websocket.send_json(analysis_data), timeout=5.0)
-                except Exception:
-                    break
-                    
+                if frame_bytes is not None:
+                    await asyncio.wait_for(websocket.send_bytes(frame_bytes), timeout=5.0)
+                await asyncio.wait_for(websocket.send_text(json.dumps(analysis_data)), timeout=5.0)
             except Exception:
                 break
+            skipper.record(time.perf_counter() - arrived)
                 
     except Exception as e:
         print(f"Session Error: {e}")
     finally:
+        session.connected = False
         if session_id in sessions:
             async def cleanup(sid):
-                await asyncio.sleep(300)
-                if sid in sessions: del sessions[sid]
+                await asyncio.sleep(SESSION_RETENTION_SECONDS)
+                # Not if the client reconnected under the same id meanwhile
+                if sessions.get(sid) is session: del sessions[sid]
             asyncio.create_task(cleanup(session_id))
         
-        if MEDIAPIPE_AVAILABLE and holistic:
-            holistic.close()
+        reader.cancel()
+        if holistic:
+            await loop.run_in_executor(FRAME_POOL, close_holistic, holistic)
         connection_manager.disconnect(session_id)
 
 # === Graphs Endpoint ===
+# Rendering runs in GRAPH_POOL (graphs.py, Figure API) and results are cached
+# per session and history version, so repeated calls are free until new frames arrive.
+# Concurrent requests for the same session, format and version share one render.
+GRAPH_WORKERS = int(os.environ.get("GRAPH_WORKERS", 2))
+GRAPH_POOL = ThreadPoolExecutor(max_workers=GRAPH_WORKERS, thread_name_prefix="graphs")
+GRAPH_FORMATS = ("png", "json")
+
 @app.post("/generate-graphs")
-async def generate_graphs(session_id: dict):
+async def generate_graphs(session_id: dict, format: str = "png"):
+    if format not in GRAPH_FORMATS: return {"error": f"Unknown format: {format} (expected one of {GRAPH_FORMATS})"}
     try:
         if isinstance(session_id, dict): session_id = session_id.get("session_id", "")
         else: session_id = str(session_id)
@@ -357,59 +579,46 @@ async def generate_graphs(session_id: dict):
     except:
         # Dummy data for robustness
         session = SessionData()
-        session.prediction_history = ["Standing"] * 10
-        session.smoothed_scores = [0.5] * 10
-
-    if not session.prediction_history: return {"error": "No data"}
-    
-    graph_data = {}
-    counts = Counter(session.prediction_history)
-    
-    # 1. Action Frequency
-    plt.figure(figsize=(9, 4.5))
-    plt.style.use('dark_background')
-    plt.bar(list(counts.keys()), list(counts.values()), color='#00FFE3', edgecolor='cyan')
-    plt.title("Action Frequency")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    graph_data["actionFrequency"] = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
-    # 2. Timeline
-    plt.figure(figsize=(12, 3.5))
-    plt.plot(session.prediction_history, marker='o', linestyle='--', color='#FF00FF')
-    plt.title("Behavior Timeline")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    graph_data["behaviorTimeline"] = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
-    # 3. Intensity
-    plt.figure(figsize=(10, 3.5))
-    plt.plot(session.smoothed_scores, color='#32CD32')
-    plt.title("Movement Intensity")
-    plt.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    graph_data["movementIntensity"] = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
-    graph_data["summary"] = {
-        "totalFrames": len(session.prediction_history),
-        "totalTime": round(len(session.prediction_history) / 30, 2),
+        for _ in range(10):
+            session.history.append("Standing", 0.5, 0.5)
+
+    if not len(session.history): return {"error": "No data"}
+
+    version = session.history.version
+    cached = session.graph_cache.get(format)
+    if cached and cached[0] == version: return cached[1]
+
+    running = session.graph_renders.get(format)
+    if running is None or running[0] != version:
+        task = asyncio.ensure_future(build_graphs(session, format, version))
+        running = session.graph_renders[format] = (version, task)
+
+        def forget(done, format=format):
+            if session.graph_renders.get(format, (None, None))[1] is done:
+                del session.graph_renders[format]
+        task.add_done_callback(forget)
+    # Shielded: a client going away does not cancel the render for the others
+    return await asyncio.shield(running[1])
+
+async def build_graphs(session, format, version):
+    """One render of a session's graphs, cached under `version`"""
+    snapshot = session.history.snapshot()
+    counts = snapshot["counts"]
+    summary = {
+        "totalFrames": snapshot["frames"],
+        "totalTime": round(snapshot["frames"] / 30, 2),
         "mostFrequentBehavior": max(counts, key=counts.get) if counts else "None",
-        "averageIntensity": 0.5,
-        "peakIntensity": 1.0,
-        "peakTime": 0.0
+        "averageIntensity": round(session.movement.average, 3),
+        "peakIntensity": round(session.movement.peak, 3),
+        "peakTime": round(session.movement.peak_time, 2)
     }
-    
+
+    # ?format=json: pre-aggregated, downsampled series for drawing in the browser
+    build = graph_series if format == "json" else render_graphs
+    graph_data = await asyncio.get_running_loop().run_in_executor(GRAPH_POOL, build, snapshot, GRAPH_MAX_POINTS)
+    graph_data["summary"] = summary
+
+    session.graph_cache[format] = (version, graph_data)
     return graph_data
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+Per-session frame flow for the fixed_colab WebSocket handler.
+
+FrameMailbox is a size-1, latest-frame-wins slot between the task reading
+the socket and the task processing frames: a frame that arrives while the
+previous one is still waiting replaces it (and is counted as dropped), so
+processing always starts on the freshest frame and latency cannot pile up
+in the socket.
+
+AdaptiveSkip decides which of the frames taken from the mailbox are
+processed (1 in `skip`). The ratio follows the measured end-to-end frame
+latency (arrival to reply sent) against a target: above the target it
+skips more, well below it skips less. The two do not throttle the same
+stretch twice: a frame taken after the mailbox dropped one (processing
+already falls behind the client) is always processed, so the skip ratio
+only thins out frames while the mailbox keeps up.
+"""
+import asyncio
+
+
+class FrameMailbox:
+    def __init__(self):
+        self._item = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Stores `item`, replacing an unprocessed one. Returns True if one was dropped."""
+        self.received += 1
+        replaced = self._item is not None
+        if replaced:
+            self.dropped += 1
+        self._item = item
+        self._event.set()
+        return replaced
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """Newest frame, waiting for one if the slot is empty; None once closed."""
+        while self._item is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        item, self._item = self._item, None
+        return item
+
+
+class AdaptiveSkip:
+    def __init__(self, target_latency, initial=2, max_skip=6, alpha=0.2, adjust_every=10):
+        self.target_latency = float(target_latency)  # seconds
+        self.skip = max(1, int(initial))
+        self.max_skip = max(self.skip, int(max_skip))
+        self.alpha = alpha
+        self.adjust_every = adjust_every
+
+        self.latency = None  # EMA, seconds
+        self.seen = 0
+        self.skipped = 0
+        self.processed = 0
+        self._since_adjust = 0
+
+    def should_process(self, throttled=False):
+        """throttled: frames were dropped upstream since the previous call."""
+        self.seen += 1
+        if not throttled and self.seen % self.skip != 0:
+            self.skipped += 1
+            return False
+        self.processed += 1
+        return True
+
+    def record(self, seconds):
+        """Latency of one processed frame; adjusts the skip ratio every `adjust_every` frames."""
+        self.latency = seconds if self.latency is None else \
+            self.alpha * seconds + (1 - self.alpha) * self.latency
+
+        self._since_adjust += 1
+        if self._since_adjust < self.adjust_every:
+            return
+        self._since_adjust = 0
+        if self.latency > self.target_latency and self.skip < self.max_skip:
+            self.skip += 1
+        elif self.latency < self.target_latency * 0.5 and self.skip > 1:
+            self.skip -= 1
+
+    def stats(self):
+        return {
+            "frameSkip": self.skip,
+            "skippedFrames": self.skipped,
+            "processedFrames": self.processed,
+            "latencyMs": round(self.latency * 1000, 1) if self.latency is not None else None,
+        }
@@ -0,0 +1,130 @@
+"""
+Session graphs for /generate-graphs, from a SessionHistory.snapshot().
+
+graph_series() pre-aggregates the snapshot into small JSON-ready series
+(behavior counts, a step timeline from the run-length encoded behaviors,
+the movement intensity curve), downsampling long series with LTTB
+(Largest-Triangle-Three-Buckets) to at most `max_points` points.
+render_graphs() draws those series as PNGs with the object-oriented
+Figure API (no pyplot global state), so it can run in worker threads.
+"""
+import base64
+import io
+
+import numpy as np
+from matplotlib.figure import Figure
+
+GRAPH_MAX_POINTS = 1000
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the points LTTB keeps (always the first and last) out of len(x)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        # Point of this bucket with the largest triangle (previous kept point, it, next bucket mean)
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def graph_series(snapshot, max_points=GRAPH_MAX_POINTS):
+    """JSON-ready series for the three charts."""
+    counts = snapshot["counts"]
+
+    # Timeline: one step per run, y = index into `categories`
+    codes, lengths = snapshot["codes"], snapshot["lengths"]
+    starts = snapshot["timeline_offset"] + np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)[:-1]))
+    present = list(dict.fromkeys(codes.tolist()))
+    labels = snapshot["labels"]
+    categories = [labels[c] for c in present]
+    category_of = np.zeros(max(present, default=0) + 1, dtype=np.int64)
+    category_of[present] = np.arange(len(present))
+    steps = category_of[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+    keep = lttb_indices(starts, steps, max_points)
+
+    scores = snapshot["scores"]
+    frames = snapshot["scores_offset"] + np.arange(len(scores))
+    keep_scores = lttb_indices(frames, scores, max_points)
+
+    return {
+        "actionFrequency": {"labels": list(counts), "counts": list(counts.values())},
+        "behaviorTimeline": {
+            "categories": categories,
+            "x": starts[keep].tolist(),
+            "y": steps[keep].tolist(),
+            "end": snapshot["frames"],
+        },
+        "movementIntensity": {
+            "x": frames[keep_scores].tolist(),
+            "y": np.round(scores[keep_scores].astype(np.float64), 3).tolist(),
+        },
+    }
+
+
+def _dark_axes(fig, ax, title):
+    # dark_background look, set per figure (matplotlib.style would change global rcParams)
+    fig.patch.set_facecolor("black")
+    ax.set_facecolor("black")
+    ax.set_title(title, color="white")
+    ax.tick_params(colors="white")
+    for spine in ax.spines.values():
+        spine.set_color("white")
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", facecolor=fig.get_facecolor())
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def render_graphs(snapshot, max_points=GRAPH_MAX_POINTS):
+    """Base64 PNGs of the three charts."""
+    series = graph_series(snapshot, max_points)
+    graph_data = {}
+
+    # 1. Action Frequency
+    freq = series["actionFrequency"]
+    fig = Figure(figsize=(9, 4.5))
+    ax = fig.subplots()
+    _dark_axes(fig, ax, "Action Frequency")
+    ax.bar(freq["labels"], freq["counts"], color="#00FFE3", edgecolor="cyan")
+    ax.tick_params(axis="x", labelrotation=45)
+    graph_data["actionFrequency"] = _png(fig)
+
+    # 2. Timeline
+    timeline = series["behaviorTimeline"]
+    fig = Figure(figsize=(12, 3.5))
+    ax = fig.subplots()
+    _dark_axes(fig, ax, "Behavior Timeline")
+    x = timeline["x"] + [timeline["end"]]
+    y = timeline["y"] + timeline["y"][-1:]
+    ax.step(x, y, where="post", marker="o", markersize=3, linestyle="--", color="#FF00FF")
+    ax.set_yticks(range(len(timeline["categories"])))
+    ax.set_yticklabels(timeline["categories"])
+    graph_data["behaviorTimeline"] = _png(fig)
+
+    # 3. Intensity
+    intensity = series["movementIntensity"]
+    fig = Figure(figsize=(10, 3.5))
+    ax = fig.subplots()
+    _dark_axes(fig, ax, "Movement Intensity")
+    ax.plot(intensity["x"], intensity["y"], color="#32CD32")
+    graph_data["movementIntensity"] = _png(fig)
+
+    return graph_data
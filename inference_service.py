@@ -0,0 +1,137 @@
+"""
+Cross-stream batched YOLO inference.
+
+Every active stream submits its frames to one BatchInferenceService. A single
+worker thread gathers whatever frames arrive within a short deadline, runs one
+batched forward pass, then feeds each stream's detections to that stream's
+own ByteTrack instance, so track IDs never mix between cameras.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+try:
+    from ultralytics.utils import YAML
+    _load_yaml = YAML.load
+except ImportError:  # older ultralytics releases
+    from ultralytics.utils import yaml_load as _load_yaml
+
+
+class StreamTracker:
+    """One ByteTrack state per stream (what model.track(persist=True) keeps globally)."""
+
+    def __init__(self, tracker_cfg="bytetrack.yaml"):
+        cfg = IterableSimpleNamespace(**_load_yaml(check_yaml(tracker_cfg)))
+        self.tracker = BYTETracker(args=cfg)
+
+    def update(self, result):
+        """Returns the result filtered to tracked boxes, with track IDs attached."""
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            return result[:0]
+        idx = tracks[:, -1].astype(int)
+        result = result[idx]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+        return result
+
+
+class BatchInferenceService:
+    """
+    infer(stream_id, frame) blocks until the frame's tracked result is ready.
+    Frames from different streams that arrive within `max_wait_ms` of each
+    other share one forward pass of up to `max_batch` images.
+    """
+
+    def __init__(self, model, max_batch=8, max_wait_ms=10, tracker_cfg="bytetrack.yaml", **predict_kwargs):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.tracker_cfg = tracker_cfg
+        self.predict_kwargs = predict_kwargs
+
+        self._requests = queue.Queue()
+        self._trackers = {}
+        self._trackers_lock = threading.Lock()
+
+        self.batches = 0
+        self.frames = 0
+        self.avg_batch_ms = 0.0
+        self.max_batch_seen = 0
+
+        self._worker = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+        self._worker.start()
+
+    def infer(self, stream_id, frame):
+        future = Future()
+        self._requests.put((stream_id, frame, future))
+        return future.result()
+
+    def release_stream(self, stream_id):
+        # Called when a stream ends so its tracker state is dropped
+        with self._trackers_lock:
+            self._trackers.pop(stream_id, None)
+
+    def _tracker_for(self, stream_id):
+        with self._trackers_lock:
+            tracker = self._trackers.get(stream_id)
+            if tracker is None:
+                tracker = self._trackers[stream_id] = StreamTracker(self.tracker_cfg)
+            return tracker
+
+    def _collect_batch(self):
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            t0 = time.perf_counter()
+            try:
+                results = self.model.predict(
+                    source=[frame for _, frame, _ in batch],
+                    verbose=False,
+                    **self.predict_kwargs
+                )
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (stream_id, _, future), result in zip(batch, results):
+                try:
+                    future.set_result(self._tracker_for(stream_id).update(result))
+                except Exception as e:
+                    future.set_exception(e)
+
+            ms = (time.perf_counter() - t0) * 1000.0
+            self.batches += 1
+            self.frames += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.avg_batch_ms = ms if self.batches == 1 else 0.9 * self.avg_batch_ms + 0.1 * ms
+
+    def stats(self):
+        with self._trackers_lock:
+            active_streams = list(self._trackers)
+        return {
+            "active_streams": active_streams,
+            "pending": self._requests.qsize(),
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_batch_ms": round(self.avg_batch_ms, 2),
+        }
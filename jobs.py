@@ -0,0 +1,158 @@
+"""
+Offline processing jobs for uploaded videos.
+
+A job runs a file through the same tracking/logging path as /video_file_feed,
+but headless and unpaced, so it finishes as fast as the hardware allows and
+keeps going when the browser disconnects. Jobs wait in a queue and at most
+`max_workers` run at once. Finished jobs stay listed for `retention_seconds`,
+at most `max_finished` of them.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from pipeline import FramePipeline
+
+
+def _discard(frame):
+    # Jobs produce no video, only CSV rows + crops
+    return b""
+
+
+class VideoJob:
+    def __init__(self, file_path):
+        self.id = uuid.uuid4().hex[:12]
+        self.file_path = file_path
+        self.status = "queued"  # queued | running | done | failed | cancelled
+        self.error = None
+        self.total_frames = 0
+        self.frames_done = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def as_dict(self):
+        now = self.finished_at or time.time()
+        elapsed = (now - self.started_at) if self.started_at else 0.0
+        fps = self.frames_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and fps > 0 and self.total_frames:
+            eta = max(0.0, (self.total_frames - self.frames_done) / fps)
+        progress = (self.frames_done / self.total_frames) if self.total_frames else 0.0
+        return {
+            "job_id": self.id,
+            "file_path": self.file_path,
+            "status": self.status,
+            "error": self.error,
+            "frames_done": self.frames_done,
+            "total_frames": self.total_frames,
+            "progress": round(min(1.0, progress), 4),
+            "fps": round(fps, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "elapsed_seconds": round(elapsed, 1),
+        }
+
+
+class JobManager:
+    """
+    `process_frame(frame, frame_idx, stream_id)` is the per-frame work
+    (server.py passes its headless _run_track_on_frame wrapper);
+    `release_stream(stream_id)` drops the job's tracker state when it ends
+    (from the pipeline's inference stage, after the job's last frame).
+    """
+
+    def __init__(self, process_frame, release_stream, max_workers=2, queue_size=4,
+                 retention_seconds=3600, max_finished=100):
+        self.process_frame = process_frame
+        self.release_stream = release_stream
+        self.queue_size = queue_size
+        self.retention_seconds = float(retention_seconds)
+        self.max_finished = max(0, int(max_finished))
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="video-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_path):
+        job = VideoJob(file_path)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            self._prune()
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def _prune(self):
+        # Caller holds _lock. Expired finished jobs go first, then the oldest over max_finished
+        finished = sorted((j for j in self._jobs.values() if j.finished_at is not None),
+                          key=lambda j: j.finished_at)
+        cutoff = time.time() - self.retention_seconds
+        over = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < over or job.finished_at < cutoff:
+                del self._jobs[job.id]
+
+    def _run(self, job):
+        if job._cancel.is_set():
+            return
+        cap = cv2.VideoCapture(job.file_path)
+        if not cap.isOpened():
+            job.status = "failed"
+            job.error = "Could not open video"
+            job.finished_at = time.time()
+            return
+
+        job.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        job.status = "running"
+        job.started_at = time.time()
+        stream_id = f"job-{job.id}"
+
+        def process(frame, frame_idx):
+            self.process_frame(frame, frame_idx, stream_id)
+            return None
+
+        pipeline = FramePipeline(
+            stream_id, cap, process=process, encode=_discard,
+            live=False, queue_size=self.queue_size,
+            on_stop=lambda: self.release_stream(stream_id)
+        )
+        frames = pipeline.frames()
+        try:
+            for _ in frames:
+                job.frames_done += 1
+                if job._cancel.is_set():
+                    job.status = "cancelled"
+                    break
+            else:
+                if pipeline.error is not None:
+                    raise pipeline.error
+                job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            # Joins the pipeline stages; the release ran after the last inferred frame
+            frames.close()
+            job.finished_at = time.time()
@@ -0,0 +1,63 @@
+"""
+Server lifecycle state (loading -> warming -> ready, or failed) with a
+per-phase startup timing breakdown, for /ready and the startup log.
+"""
+import threading
+import time
+
+LIFECYCLE_STATES = ("loading", "warming", "ready", "failed")
+
+
+class Lifecycle:
+    def __init__(self, started=None):
+        # `started`: time.perf_counter() taken before the heavy imports
+        self.started = time.perf_counter() if started is None else started
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+        self._mark = self.started
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def phase_done(self, name):
+        """Records the time since the previous phase ended under `name` (seconds)."""
+        now = time.perf_counter()
+        with self._lock:
+            self.timings[name] = round(now - self._mark, 3)
+            self._mark = now
+
+    def set_state(self, state, error=None):
+        if state not in LIFECYCLE_STATES:
+            raise ValueError(f"Unknown lifecycle state: {state} (expected one of {LIFECYCLE_STATES})")
+        with self._lock:
+            self.state = state
+            self.error = str(error) if error is not None else None
+            if state in ("ready", "failed"):
+                self.timings["total"] = round(time.perf_counter() - self.started, 3)
+        if state == "ready":
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def summary(self):
+        # e.g. "imports 2.31s, model_load 0.85s, warmup 1.20s (total 4.36s)"
+        with self._lock:
+            timings = dict(self.timings)
+        total = timings.pop("total", None)
+        text = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        return f"{text} (total {total:.2f}s)" if total is not None else text
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "ready": self.state == "ready",
+                "error": self.error,
+                "uptime_s": round(time.perf_counter() - self.started, 1),
+                "startup_timings_s": dict(self.timings),
+            }
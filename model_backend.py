@@ -0,0 +1,187 @@
+"""
+Pluggable CPU inference backends for best.pt.
+
+load_detector() returns an ultralytics YOLO object for the configured backend,
+so predict(), Results, tracking and post-processing stay exactly the same:
+
+- "torch":          best.pt through PyTorch (previous behavior)
+- "onnx":           ONNX Runtime, FP32
+- "onnx-int8":      ONNX Runtime, static INT8 (QDQ) quantization
+- "openvino":       OpenVINO IR, FP32
+- "openvino-int8":  OpenVINO IR quantized with NNCF
+
+Exported models are cached under exports/<weights stem>-<weights hash>/,
+so a backend is only exported (and calibrated) once per version of best.pt.
+INT8 calibration uses frames sampled from the images and videos in uploads/.
+"""
+import glob
+import hashlib
+import os
+import shutil
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+MODEL_BACKENDS = ("torch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+EXPORT_DIR = "exports"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+
+def _weights_hash(weights):
+    h = hashlib.sha1()
+    with open(weights, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _cache_dir(weights, imgsz, export_dir):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    path = os.path.join(export_dir, f"{stem}-{_weights_hash(weights)}-{imgsz}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# ---------- calibration ----------
+def calibration_frames(calib_dir="uploads", max_frames=200):
+    """BGR frames sampled evenly from the images and videos in calib_dir."""
+    files = sorted(p for p in glob.glob(os.path.join(calib_dir, "*")) if os.path.isfile(p))
+    images = [p for p in files if p.lower().endswith(IMAGE_EXTENSIONS)]
+    videos = [p for p in files if p.lower().endswith(VIDEO_EXTENSIONS)]
+
+    frames = []
+    for path in images[:max_frames]:
+        img = cv2.imread(path)
+        if img is not None:
+            frames.append(img)
+
+    per_video = (max_frames - len(frames)) // max(1, len(videos))
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        for idx in np.linspace(0, max(0, total - 1), num=min(per_video, total), dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+
+    if not frames:
+        raise ValueError(f"No calibration frames found in {calib_dir}/ (images or videos)")
+    return frames
+
+
+def preprocess(frame, imgsz=640):
+    """Letterboxed NCHW float32 RGB tensor, as the exported model expects it."""
+    h, w = frame.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    x = canvas[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(x, dtype=np.float32)[None] / 255.0
+
+
+# ---------- exporters ----------
+def _export(weights, fmt, cache, imgsz):
+    """Ultralytics export into the cache dir (the artifact lands next to the weights copy)."""
+    local = os.path.join(cache, os.path.basename(weights))
+    if not os.path.exists(local):
+        shutil.copy2(weights, local)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    target = os.path.join(cache, f"{stem}.onnx" if fmt == "onnx" else f"{stem}_openvino_model")
+    if not os.path.exists(target):
+        print(f"[INFO] Exporting {weights} to {fmt} ({target})")
+        YOLO(local).export(format=fmt, imgsz=imgsz, dynamic=True, simplify=True, verbose=False)
+    return target
+
+
+def _quantize_onnx(fp32_path, int8_path, frames, imgsz):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(frames)
+
+        def get_next(self):
+            frame = next(self._it, None)
+            return None if frame is None else {input_name: preprocess(frame, imgsz)}
+
+    tmp = int8_path + ".tmp"
+    quantize_static(
+        fp32_path, tmp, _Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    # Keep the names/stride/imgsz metadata ultralytics reads back from the model
+    src = onnx.load(fp32_path)
+    dst = onnx.load(tmp)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, int8_path)
+    os.remove(tmp)
+
+
+def _quantize_openvino(fp32_dir, int8_dir, frames, imgsz):
+    import nncf
+    import openvino as ov
+
+    xml = glob.glob(os.path.join(fp32_dir, "*.xml"))[0]
+    core = ov.Core()
+    quantized = nncf.quantize(
+        core.read_model(xml),
+        nncf.Dataset(frames, lambda frame: preprocess(frame, imgsz)),
+        subset_size=len(frames)
+    )
+    tmp = int8_dir + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+    ov.save_model(quantized, os.path.join(tmp, os.path.basename(xml)), compress_to_fp16=False)
+    shutil.copy2(os.path.join(fp32_dir, "metadata.yaml"), tmp)
+    os.replace(tmp, int8_dir)
+
+
+def export_backend(weights="best.pt", backend="onnx", imgsz=640, calib_dir="uploads",
+                   calib_frames=200, export_dir=EXPORT_DIR):
+    """Returns the cached model path for `backend`, exporting/quantizing it first if needed."""
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend} (expected one of {MODEL_BACKENDS})")
+    if backend == "torch":
+        return weights
+
+    cache = _cache_dir(weights, imgsz, export_dir)
+    fmt = backend.split("-")[0]
+    fp32 = _export(weights, fmt, cache, imgsz)
+    if not backend.endswith("-int8"):
+        return fp32
+
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    if fmt == "onnx":
+        int8 = os.path.join(cache, f"{stem}_int8.onnx")
+    else:
+        int8 = os.path.join(cache, f"{stem}_int8_openvino_model")
+    if not os.path.exists(int8):
+        frames = calibration_frames(calib_dir, calib_frames)
+        print(f"[INFO] Calibrating INT8 {fmt} model on {len(frames)} frames from {calib_dir}/")
+        if fmt == "onnx":
+            _quantize_onnx(fp32, int8, frames, imgsz)
+        else:
+            _quantize_openvino(fp32, int8, frames, imgsz)
+    return int8
+
+
+def load_detector(weights="best.pt", backend="torch", imgsz=640, **export_kwargs):
+    """YOLO model for `backend`; predict() output is the same for every backend."""
+    path = export_backend(weights, backend, imgsz=imgsz, **export_kwargs)
+    print(f"[INFO] Model backend: {backend} ({path})")
+    if backend == "torch":
+        return YOLO(path)
+    return YOLO(path, task="detect")
@@ -60,6 +60,7 @@ document.addEventListener('DOMContentLoaded', ()=>{
   preview.parentNode.insertBefore(table, preview.nextSibling);
 
   let detectionInterval;
+  let detectionSource;
 
   // ------------------------------
   // Helpers
@@ -105,100 +106,262 @@ document.addEventListener('DOMContentLoaded', ()=>{
     tbody.innerHTML = '';
   }
 
+  // Incremental updates: only events newer than the cursor are fetched
+  const MAX_ROWS = 80;
+  let detectionCursor = 0;
+
+  function buildDetectionRow(det0) {
+    const det = normalizeDet(det0);
+
+    const row = document.createElement('tr');
+    if ((det.label || '').toLowerCase() === 'child' || (det.human_id || '').toLowerCase().startsWith('child')) {
+      row.style.backgroundColor = '#ffeb3b'; // Highlight child
+    }
+
+    // ID
+    const tdId = document.createElement('td');
+    tdId.textContent = det.human_id || 'NA';
+    tdId.style.border = '1px solid #ddd';
+    tdId.style.padding = '8px';
+    tdId.style.fontWeight = '600';
+    row.appendChild(tdId);
+
+    // Label
+    const tdLabel = document.createElement('td');
+    tdLabel.textContent = det.label || 'NA';
+    tdLabel.style.border = '1px solid #ddd';
+    tdLabel.style.padding = '8px';
+    row.appendChild(tdLabel);
+
+    // Confidence
+    const tdConf = document.createElement('td');
+    tdConf.textContent = safeFixed(det.confidence, 2);
+    tdConf.style.border = '1px solid #ddd';
+    tdConf.style.padding = '8px';
+    row.appendChild(tdConf);
+
+    // Timestamp
+    const tdTs = document.createElement('td');
+    tdTs.textContent = formatTimestamp(det.timestamp);
+    tdTs.style.border = '1px solid #ddd';
+    tdTs.style.padding = '8px';
+    row.appendChild(tdTs);
+
+    // Posture
+    const tdPost = document.createElement('td');
+    tdPost.textContent = det.posture || 'NA';
+    tdPost.style.border = '1px solid #ddd';
+    tdPost.style.padding = '8px';
+    row.appendChild(tdPost);
+
+    // Motion
+    const tdMotion = document.createElement('td');
+    tdMotion.textContent = safeFixed(det.motion, 2);
+    tdMotion.style.border = '1px solid #ddd';
+    tdMotion.style.padding = '8px';
+    row.appendChild(tdMotion);
+
+    // Scale hint
+    const tdScale = document.createElement('td');
+    tdScale.textContent = det.scaleHint ? 'Yes' : 'No';
+    tdScale.style.border = '1px solid #ddd';
+    tdScale.style.padding = '8px';
+    row.appendChild(tdScale);
+
+    // Crop thumbnail
+    const tdCrop = document.createElement('td');
+    tdCrop.style.border = '1px solid #ddd';
+    tdCrop.style.padding = '8px';
+    tdCrop.style.textAlign = 'center';
+
+    if (det.cropUrl) {
+      const img = document.createElement('img');
+      img.src = det.cropUrl;
+      img.alt = det.human_id || det.label || 'crop';
+      img.style.width = '84px';
+      img.style.height = 'auto';
+      img.style.borderRadius = '8px';
+      img.style.display = 'block';
+      img.style.margin = '0 auto';
+      img.loading = 'lazy';
+      tdCrop.appendChild(img);
+    } else {
+      tdCrop.textContent = '—';
+    }
+
+    row.appendChild(tdCrop);
+
+    return row;
+  }
+
+  function addDetections(data) {
+    if (!data || !Array.isArray(data.events)) return;
+    detectionCursor = data.cursor;
+
+    // Events arrive oldest first; newest ends up at the top of the table
+    data.events.forEach(det0 => {
+      tbody.insertBefore(buildDetectionRow(det0), tbody.firstChild);
+    });
+    while (tbody.rows.length > MAX_ROWS) {
+      tbody.deleteRow(tbody.rows.length - 1);
+    }
+  }
+
   function updateDetections() {
-    fetch('/get_detections')
+    fetch(`/get_detections?since=${detectionCursor}`)
       .then(response => response.json())
-      .then(data => {
-        clearTable();
+      .then(addDetections)
+      .catch(()=>{ /* ignore transient errors */ });
+  }
 
-        // Newest first (so table shows latest at top)
-        const items = Array.isArray(data) ? [...data].reverse() : [];
+  function resetDetections(){
+    clearTable();
+    detectionCursor = 0;
+  }
 
-        items.forEach(det0 => {
-          const det = normalizeDet(det0);
+  // Server pushes one message per frame; polling is only the fallback
+  function startDetections(){
+    stopDetections();
+    resetDetections();
+    if (window.EventSource) {
+      // On reconnect the browser resumes from the last event id by itself
+      detectionSource = new EventSource(`/detections/stream?since=${detectionCursor}`);
+      detectionSource.addEventListener('detections', e => {
+        try { addDetections(JSON.parse(e.data)); } catch (err) { /* ignore bad message */ }
+      });
+      return;
+    }
+    updateDetections();
+    detectionInterval = setInterval(updateDetections, 800);
+  }
 
-          const row = document.createElement('tr');
-          if ((det.label || '').toLowerCase() === 'child' || (det.human_id || '').toLowerCase().startsWith('child')) {
-            row.style.backgroundColor = '#ffeb3b'; // Highlight child
-          }
+  function stopDetections(){
+    if(detectionSource){
+      detectionSource.close();
+      detectionSource = null;
+    }
+    if(detectionInterval){
+      clearInterval(detectionInterval);
+      detectionInterval = null;
+    }
+  }
 
-          // ID
-          const tdId = document.createElement('td');
-          tdId.textContent = det.human_id || 'NA';
-          tdId.style.border = '1px solid #ddd';
-          tdId.style.padding = '8px';
-          tdId.style.fontWeight = '600';
-          row.appendChild(tdId);
-
-          // Label
-          const tdLabel = document.createElement('td');
-          tdLabel.textContent = det.label || 'NA';
-          tdLabel.style.border = '1px solid #ddd';
-          tdLabel.style.padding = '8px';
-          row.appendChild(tdLabel);
-
-          // Confidence
-          const tdConf = document.createElement('td');
-          tdConf.textContent = safeFixed(det.confidence, 2);
-          tdConf.style.border = '1px solid #ddd';
-          tdConf.style.padding = '8px';
-          row.appendChild(tdConf);
-
-          // Timestamp
-          const tdTs = document.createElement('td');
-          tdTs.textContent = formatTimestamp(det.timestamp);
-          tdTs.style.border = '1px solid #ddd';
-          tdTs.style.padding = '8px';
-          row.appendChild(tdTs);
-
-          // Posture
-          const tdPost = document.createElement('td');
-          tdPost.textContent = det.posture || 'NA';
-          tdPost.style.border = '1px solid #ddd';
-          tdPost.style.padding = '8px';
-          row.appendChild(tdPost);
-
-          // Motion
-          const tdMotion = document.createElement('td');
-          tdMotion.textContent = safeFixed(det.motion, 2);
-          tdMotion.style.border = '1px solid #ddd';
-          tdMotion.style.padding = '8px';
-          row.appendChild(tdMotion);
-
-          // Scale hint
-          const tdScale = document.createElement('td');
-          tdScale.textContent = det.scaleHint ? 'Yes' : 'No';
-          tdScale.style.border = '1px solid #ddd';
-          tdScale.style.padding = '8px';
-          row.appendChild(tdScale);
-
-          // Crop thumbnail
-          const tdCrop = document.createElement('td');
-          tdCrop.style.border = '1px solid #ddd';
-          tdCrop.style.padding = '8px';
-          tdCrop.style.textAlign = 'center';
-
-          if (det.cropUrl) {
-            const img = document.createElement('img');
-            img.src = det.cropUrl;
-            img.alt = det.human_id || det.label || 'crop';
-            img.style.width = '84px';
-            img.style.height = 'auto';
-            img.style.borderRadius = '8px';
-            img.style.display = 'block';
-            img.style.margin = '0 auto';
-            img.loading = 'lazy';
-            tdCrop.appendChild(img);
-          } else {
-            tdCrop.textContent = '—';
+  // ------------------------------
+  // Client-side overlay (open the page with ?overlay=client)
+  // The server sends raw frames + per-frame JSON (mode=meta); boxes are drawn here.
+  // ------------------------------
+  const CLIENT_OVERLAY = new URLSearchParams(window.location.search).get('overlay') === 'client';
+  const HEADER_END = [13, 10, 13, 10]; // \r\n\r\n
+  let metaStreamAbort = null;
+
+  function indexOfBytes(buf, seq, from){
+    outer: for (let i = from; i <= buf.length - seq.length; i++) {
+      for (let j = 0; j < seq.length; j++) {
+        if (buf[i + j] !== seq[j]) continue outer;
+      }
+      return i;
+    }
+    return -1;
+  }
+
+  function drawOverlay(ctx, meta, scale){
+    if (!meta || !Array.isArray(meta.detections)) return;
+    ctx.lineWidth = 2;
+    ctx.font = '16px sans-serif';
+    meta.detections.forEach(det => {
+      const [x1, y1, x2, y2] = det.bbox.map(v => v * scale);
+      const isChild = (det.label || '').toLowerCase() === 'child';
+      ctx.strokeStyle = isChild ? '#ffeb3b' : '#00e676';
+      ctx.setLineDash(det.origin === 'propagated' ? [6, 4] : []);
+      ctx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+      let label = det.human_id || det.label || '';
+      if (det.confidence !== null && det.confidence !== undefined) label += ` ${safeFixed(det.confidence, 2)}`;
+      ctx.setLineDash([]);
+      ctx.fillStyle = 'rgba(0,0,0,0.6)';
+      ctx.fillRect(x1, Math.max(0, y1 - 20), ctx.measureText(label).width + 8, 20);
+      ctx.fillStyle = '#ffffff';
+      ctx.fillText(label, x1 + 4, Math.max(15, y1 - 5));
+    });
+  }
+
+  async function startMetaStream(url, canvas){
+    stopMetaStream();
+    const ctrl = new AbortController();
+    metaStreamAbort = ctrl;
+    const ctx = canvas.getContext('2d');
+    const decoder = new TextDecoder();
+    let buf = new Uint8Array(0);
+    let meta = null;
+    let lastDrawn = -1;
+
+    try{
+      const response = await fetch(url, { signal: ctrl.signal });
+      const reader = response.body.getReader();
+      for(;;){
+        const { value, done } = await reader.read();
+        if (done) break;
+        const merged = new Uint8Array(buf.length + value.length);
+        merged.set(buf);
+        merged.set(value, buf.length);
+        buf = merged;
+
+        // Every part carries Content-Length, so parts are cut without scanning bodies
+        for(;;){
+          const headerEnd = indexOfBytes(buf, HEADER_END, 0);
+          if (headerEnd < 0) break;
+          const headers = decoder.decode(buf.subarray(0, headerEnd));
+          const lengthMatch = /content-length:\s*(\d+)/i.exec(headers);
+          const start = headerEnd + HEADER_END.length;
+          if (!lengthMatch) { buf = buf.subarray(start); continue; }
+          const length = parseInt(lengthMatch[1], 10);
+          if (buf.length < start + length + 2) break;
+          const body = buf.slice(start, start + length);
+          buf = buf.subarray(start + length + 2);
+
+          if (/application\/json/i.test(headers)) {
+            meta = JSON.parse(decoder.decode(body));
+          } else if (/image\/jpeg/i.test(headers)) {
+            const frameMeta = meta;
+            const frameIdx = frameMeta ? frameMeta.frame : lastDrawn + 1;
+            createImageBitmap(new Blob([body], { type: 'image/jpeg' })).then(bitmap => {
+              if (frameIdx < lastDrawn || ctrl.signal.aborted) return; // a newer frame is already up
+              lastDrawn = frameIdx;
+              canvas.width = bitmap.width;
+              canvas.height = bitmap.height;
+              ctx.drawImage(bitmap, 0, 0);
+              // The frame may be downscaled by the delivery profile; boxes are in source pixels
+              drawOverlay(ctx, frameMeta, frameMeta && frameMeta.width ? bitmap.width / frameMeta.width : 1);
+            }).catch(()=>{ /* skip undecodable frame */ });
           }
+        }
+      }
+    }catch(e){
+      if (!ctrl.signal.aborted) console.warn('Metadata stream stopped:', e);
+    }
+  }
 
-          row.appendChild(tdCrop);
+  function stopMetaStream(){
+    if(metaStreamAbort){
+      metaStreamAbort.abort();
+      metaStreamAbort = null;
+    }
+  }
 
-          tbody.appendChild(row);
-        });
-      })
-      .catch(()=>{ /* ignore transient errors */ });
+  // Processed stream: server-drawn MJPEG <img>, or raw frames + client overlay on a <canvas>
+  function showProcessedStream(url){
+    if (CLIENT_OVERLAY) {
+      const canvas = document.createElement('canvas');
+      canvas.style.maxWidth = '100%';
+      canvas.style.borderRadius = '12px';
+      preview.appendChild(canvas);
+      startMetaStream(url + (url.includes('?') ? '&' : '?') + 'mode=meta', canvas);
+      return;
+    }
+    const img = document.createElement('img');
+    img.src = url;
+    img.style.maxWidth = '100%';
+    img.style.borderRadius = '12px';
+    preview.appendChild(img);
   }
 
   // ------------------------------
@@ -209,10 +372,8 @@ document.addEventListener('DOMContentLoaded', ()=>{
 
   function clearPreview(){
     preview.innerHTML = '';
-    if(detectionInterval){
-      clearInterval(detectionInterval);
-      detectionInterval = null;
-    }
+    stopDetections();
+    stopMetaStream();
   }
 
   realtimeBtn && realtimeBtn.addEventListener('click', async ()=>{
@@ -282,17 +443,12 @@ document.addEventListener('DOMContentLoaded', ()=>{
       clearPreview();
 
       // processed stream
-      const img = document.createElement('img');
-      img.src = '/video_feed?mode=processed';
-      img.style.maxWidth = '100%';
-      img.style.borderRadius = '12px';
-      preview.appendChild(img);
+      showProcessedStream(CLIENT_OVERLAY ? '/video_feed' : '/video_feed?mode=processed');
 
       currentSource = 'processed_camera';
 
       // Start updating detections
-      updateDetections();
-      detectionInterval = setInterval(updateDetections, 800);
+      startDetections();
 
       alert('Detection started on live camera feed!');
     }
@@ -305,16 +461,11 @@ document.addEventListener('DOMContentLoaded', ()=>{
       clearPreview();
 
       // server-side processed stream
-      const img = document.createElement('img');
-      img.src = `/video_file_feed?file_path=${encodeURIComponent(uploadedFilePath)}`;
-      img.style.maxWidth = '100%';
-      img.style.borderRadius = '12px';
-      preview.appendChild(img);
+      showProcessedStream(`/video_file_feed?file_path=${encodeURIComponent(uploadedFilePath)}`);
 
       currentSource = 'processed_file';
 
-      updateDetections();
-      detectionInterval = setInterval(updateDetections, 800);
+      startDetections();
     }
     else {
       alert('Select Real-time or Local file first.');
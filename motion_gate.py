@@ -0,0 +1,69 @@
+"""
+Motion gate in front of detection: skip YOLO on static scenes.
+
+The gate compares the current grayscale frame with the frame of the last
+detection, per region (a coarse grid of cell means, so a small moving object
+in a corner still counts). While nothing is tracked and no cell changed by
+more than `threshold`, detection is skipped. Any motion re-arms it at once,
+and a detection is forced at least every `max_skip_seconds` so slow changes
+or missed objects are eventually caught.
+"""
+import time
+
+import cv2
+
+GATE_REASONS = ("tracks", "motion", "forced", "first")
+
+
+class MotionGate:
+    def __init__(self, threshold=8.0, max_skip_seconds=5.0, cols=8, rows=6):
+        self.threshold = float(threshold)
+        self.max_skip_seconds = float(max_skip_seconds)
+        self.cols = int(cols)
+        self.rows = int(rows)
+
+        self.reference = None  # gray frame of the last detection
+        self.last_detect = 0.0
+        self.last_score = 0.0
+
+        self.gated_frames = 0
+        self.detections = {reason: 0 for reason in GATE_REASONS}
+
+    def change_score(self, gray):
+        """Largest per-cell mean abs difference against the reference frame (0..255)."""
+        diff = cv2.absdiff(self.reference, gray)
+        cells = cv2.resize(diff, (self.cols, self.rows), interpolation=cv2.INTER_AREA)
+        return float(cells.max())
+
+    def should_detect(self, gray, has_tracks, now=None):
+        """True = run detection on this frame (and make it the new reference)."""
+        now = time.time() if now is None else now
+        if self.reference is None or self.reference.shape != gray.shape:
+            reason = "first"
+        elif has_tracks:
+            reason = "tracks"
+        elif now - self.last_detect >= self.max_skip_seconds:
+            reason = "forced"
+        else:
+            self.last_score = self.change_score(gray)
+            if self.last_score < self.threshold:
+                self.gated_frames += 1
+                return False
+            reason = "motion"
+        self.detections[reason] += 1
+        self.reference = gray
+        self.last_detect = now
+        return True
+
+    def stats(self):
+        detected = sum(self.detections.values())
+        total = detected + self.gated_frames
+        return {
+            "gated_frames": self.gated_frames,
+            "detected_frames": detected,
+            "gated_ratio": round(self.gated_frames / total, 3) if total else 0.0,
+            "detections_by_reason": dict(self.detections),
+            "last_change_score": round(self.last_score, 2),
+            "threshold": self.threshold,
+            "max_skip_seconds": self.max_skip_seconds,
+        }
@@ -0,0 +1,52 @@
+"""
+Movement intensity from pose landmark velocity.
+
+Per processed frame: mean displacement of the pose landmarks visible in
+this frame and the previous one (normalized image units), divided by the
+time between the two frames, gives the raw speed; the score is that speed
+times `scale`, smoothed with an exponential moving average. Sum, peak and
+peak time are kept as running values, so the session summary costs nothing
+extra and every update is O(1) (a fixed 33 landmarks).
+"""
+import numpy as np
+
+MIN_VISIBILITY = 0.5
+
+
+class MovementIntensity:
+    def __init__(self, alpha=0.3, scale=10.0):
+        self.alpha = alpha
+        self.scale = scale  # 1 image width/height per second -> score `scale`
+
+        self._prev = None
+        self._prev_t = None
+        self.raw = 0.0
+        self.smoothed = 0.0
+
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+        self.peak_time = 0.0
+
+    def update(self, pose, t):
+        """Adds one frame (pose (N, 4) array or None, t in seconds); returns (raw, smoothed)."""
+        raw = 0.0
+        if pose is not None and self._prev is not None and t > self._prev_t:
+            visible = (pose[:, 3] > MIN_VISIBILITY) & (self._prev[:, 3] > MIN_VISIBILITY)
+            if visible.any():
+                step = np.linalg.norm(pose[visible, :2] - self._prev[visible, :2], axis=1).mean()
+                raw = float(step / (t - self._prev_t)) * self.scale
+        self._prev, self._prev_t = pose, t
+
+        self.raw = raw
+        self.smoothed = raw if self.count == 0 else self.alpha * raw + (1 - self.alpha) * self.smoothed
+        self.count += 1
+        self.total += self.smoothed
+        if self.smoothed > self.peak:
+            self.peak = self.smoothed
+            self.peak_time = t
+        return raw, self.smoothed
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
@@ -0,0 +1,316 @@
+"""
+Staged frame pipeline for the Flask video streams.
+
+capture -> inference -> encode, each stage on its own thread(s) with bounded
+queues in between. Live sources use latest-frame-wins queues so a slow stage
+drops stale frames instead of building up latency; file sources use blocking
+queues so every frame is processed, with several encode workers in parallel.
+"""
+import heapq
+import queue
+import threading
+import time
+
+import cv2
+
+# Marks the end of the stream inside the stage queues
+END_OF_STREAM = object()
+
+# How long stop() waits for the stage threads to finish their current frame
+STOP_JOIN_TIMEOUT = 10.0
+
+# id(pipeline) -> FramePipeline, for /pipeline_stats
+_active_pipelines = {}
+_active_lock = threading.Lock()
+
+
+class LatestFrameQueue(queue.Queue):
+    """Bounded queue that never blocks the producer: when full, the oldest frame is dropped."""
+
+    def __init__(self, maxsize=1):
+        super().__init__()  # unbounded at the Queue level, _put enforces the cap
+        self.capacity = max(1, int(maxsize))
+        self.dropped = 0
+
+    def _put(self, item):
+        if item is not END_OF_STREAM:
+            while len(self.queue) >= self.capacity:
+                # End-of-stream markers are never dropped
+                for i, old in enumerate(self.queue):
+                    if old is not END_OF_STREAM:
+                        del self.queue[i]
+                        self.dropped += 1
+                        break
+                else:
+                    break
+        self.queue.append(item)
+
+
+class BoundedFrameQueue(queue.Queue):
+    """Plain blocking queue with the same stats surface as LatestFrameQueue."""
+
+    def __init__(self, maxsize=4):
+        super().__init__(maxsize=max(1, int(maxsize)))
+        self.capacity = self.maxsize
+        self.dropped = 0
+
+
+class StageStats:
+    """Per-stage timing (EMA of milliseconds per frame) and counters."""
+
+    def __init__(self, name, alpha=0.1):
+        self.name = name
+        self.alpha = alpha
+        self.frames = 0
+        self.avg_ms = 0.0
+        self.last_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            self.frames += 1
+            self.last_ms = ms
+            self.avg_ms = ms if self.frames == 1 else (1 - self.alpha) * self.avg_ms + self.alpha * ms
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "avg_ms": round(self.avg_ms, 2),
+                "last_ms": round(self.last_ms, 2),
+            }
+
+
+def encode_jpeg(frame):
+    ok, buffer = cv2.imencode('.jpg', frame)
+    if not ok:
+        return None
+    return buffer.tobytes()
+
+
+class FramePipeline:
+    """
+    capture (1 thread) -> inference (1 thread, tracking is sequential)
+    -> encode (N threads) -> consumer generator.
+
+    `cap` is an opened cv2.VideoCapture (released when the pipeline stops),
+    `process(frame, frame_idx)` returns the frame to encode (None = raw passthrough),
+    `live` selects the drop policy.
+    `on_stop()` runs once, on the inference thread after its last process()
+    call, so per-stream state released there cannot be recreated by a frame
+    that was still in flight.
+    """
+
+    def __init__(self, name, cap, process=None, encode=encode_jpeg,
+                 live=True, queue_size=4, encode_workers=1, on_stop=None):
+        self.name = name
+        self.cap = cap
+        self.process = process
+        self.on_stop = on_stop
+        self.encode = encode
+        self.live = live
+        self.encode_workers = max(1, int(encode_workers))
+
+        if live:
+            # Live: keep only the freshest frame between stages
+            self.q_infer = LatestFrameQueue(1)
+            self.q_encode = LatestFrameQueue(1)
+            self.q_out = LatestFrameQueue(1)
+        else:
+            self.q_infer = BoundedFrameQueue(queue_size)
+            self.q_encode = BoundedFrameQueue(queue_size)
+            self.q_out = BoundedFrameQueue(queue_size + self.encode_workers)
+
+        self.stats_capture = StageStats("capture")
+        self.stats_inference = StageStats("inference")
+        self.stats_encode = StageStats("encode")
+        self.frames_out = 0
+        self.started_at = None
+        self.error = None  # exception that ended the inference stage, if any
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ---------- queue helpers ----------
+    def _put(self, q, item):
+        # Blocking put that still notices stop(); never blocks on LatestFrameQueue
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return END_OF_STREAM
+
+    # ---------- stages ----------
+    def _capture_loop(self):
+        frame_idx = 0
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.stats_capture.record(time.perf_counter() - t0)
+                if not self._put(self.q_infer, (frame_idx, frame)):
+                    break
+                frame_idx += 1
+        finally:
+            self.cap.release()
+            self._put(self.q_infer, END_OF_STREAM)
+
+    def _inference_loop(self):
+        try:
+            while True:
+                item = self._get(self.q_infer)
+                if item is END_OF_STREAM:
+                    break
+                frame_idx, frame = item
+                t0 = time.perf_counter()
+                out = self.process(frame, frame_idx) if self.process is not None else frame
+                self.stats_inference.record(time.perf_counter() - t0)
+                if not self._put(self.q_encode, (frame_idx, out)):
+                    break
+        except Exception as e:
+            self.error = e
+            print(f"[ERROR] {self.name}: inference stage failed: {e}")
+        finally:
+            if self.on_stop is not None:
+                try:
+                    self.on_stop()
+                except Exception as e:
+                    print(f"[ERROR] {self.name}: on_stop failed: {e}")
+            for _ in range(self.encode_workers):
+                self._put(self.q_encode, END_OF_STREAM)
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self._get(self.q_encode)
+                if item is END_OF_STREAM:
+                    break
+                frame_idx, frame = item
+                t0 = time.perf_counter()
+                data = self.encode(frame)
+                self.stats_encode.record(time.perf_counter() - t0)
+                # Failed encodes still pass through (as None) so file-mode ordering never stalls
+                if not self._put(self.q_out, (frame_idx, data)):
+                    break
+        finally:
+            self._put(self.q_out, END_OF_STREAM)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self.started_at = time.time()
+        targets = [("capture", self._capture_loop), ("inference", self._inference_loop)]
+        targets += [(f"encode-{i}", self._encode_loop) for i in range(self.encode_workers)]
+        for stage, target in targets:
+            t = threading.Thread(target=target, name=f"{self.name}-{stage}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        with _active_lock:
+            _active_pipelines[id(self)] = self
+
+    def stop(self, join=True, timeout=STOP_JOIN_TIMEOUT):
+        """
+        Stops all stages. With join=True, waits until the stage threads have
+        exited (and on_stop() has run), so the caller can rely on no frame
+        still being processed.
+        """
+        self._stop.set()
+        with _active_lock:
+            _active_pipelines.pop(id(self), None)
+        if not join:
+            return
+        deadline = time.perf_counter() + timeout
+        current = threading.current_thread()
+        for t in self._threads:
+            if t is not current:
+                t.join(max(0.0, deadline - time.perf_counter()))
+        alive = [t.name for t in self._threads if t.is_alive() and t is not current]
+        if alive:
+            print(f"[WARN] {self.name}: stage threads still running after stop(): {alive}")
+
+    def frames(self, pace_fps=None):
+        """
+        Yields encoded frames in order. File pipelines reorder the output of the
+        encode pool by frame index; live pipelines only drop late arrivals.
+        `pace_fps` limits output to real-time playback speed.
+        """
+        self.start()
+        interval = (1.0 / pace_fps) if pace_fps else 0.0
+        next_due = time.perf_counter()
+        pending = []       # heap of (frame_idx, data) waiting for their turn
+        expected = 0       # next frame index to emit (file mode)
+        last_emitted = -1  # live mode: drop anything older than what we sent
+        finished_workers = 0
+        try:
+            while finished_workers < self.encode_workers or pending:
+                if finished_workers < self.encode_workers:
+                    item = self._get(self.q_out)
+                    if self._stop.is_set():
+                        return
+                    if item is END_OF_STREAM:
+                        finished_workers += 1
+                    else:
+                        heapq.heappush(pending, item)
+
+                while pending:
+                    frame_idx = pending[0][0]
+                    if self.live:
+                        if frame_idx <= last_emitted:
+                            heapq.heappop(pending)
+                            continue
+                    elif frame_idx != expected and finished_workers < self.encode_workers:
+                        break
+                    frame_idx, data = heapq.heappop(pending)
+                    expected = frame_idx + 1
+                    last_emitted = frame_idx
+                    if data is None:
+                        continue
+
+                    if interval:
+                        now = time.perf_counter()
+                        if next_due > now:
+                            time.sleep(next_due - now)
+                        next_due = max(next_due, now) + interval
+
+                    self.frames_out += 1
+                    yield data
+        finally:
+            self.stop()
+
+    def stats(self):
+        elapsed = (time.time() - self.started_at) if self.started_at else 0.0
+        return {
+            "name": self.name,
+            "live": self.live,
+            "running": not self._stop.is_set(),
+            "frames_out": self.frames_out,
+            "output_fps": round(self.frames_out / elapsed, 2) if elapsed > 0 else 0.0,
+            "encode_workers": self.encode_workers,
+            "stages": {
+                "capture": self.stats_capture.as_dict(),
+                "inference": self.stats_inference.as_dict(),
+                "encode": self.stats_encode.as_dict(),
+            },
+            "queues": {
+                name: {"depth": q.qsize(), "capacity": q.capacity, "dropped": q.dropped}
+                for name, q in (("infer", self.q_infer), ("encode", self.q_encode), ("out", self.q_out))
+            },
+        }
+
+
+def pipeline_stats():
+    with _active_lock:
+        pipelines = list(_active_pipelines.values())
+    return [p.stats() for p in pipelines]
@@ -0,0 +1,131 @@
+"""
+Vectorized per-frame post-processing of tracker output for server.py.
+
+Everything here works on whole-frame arrays (N boxes at once): class-id ->
+target lookup table, box clamping, the person-height median, posture /
+child-scale hints and integral-image motion scores. Only event and log row
+construction stays per box, in server.py.
+"""
+import cv2
+import numpy as np
+
+POSTURE_LABELS = np.array(["unknown", "standing/upright", "crouched/sitting/unclear"], dtype=object)
+
+
+def build_class_lut(names, target_classes):
+    """
+    names: model.names ({class_id: name})
+    Returns (is_target[class_id] bool array, lower-cased name[class_id] object array).
+    """
+    size = (max(names) + 1) if names else 0
+    is_target = np.zeros(size, dtype=bool)
+    class_names = np.empty(size, dtype=object)
+    for cid in range(size):
+        class_names[cid] = str(cid)
+    for cid, name in names.items():
+        cname = str(name).strip().lower()
+        class_names[int(cid)] = cname
+        is_target[int(cid)] = cname in target_classes
+    return is_target, class_names
+
+
+def target_mask(cls_ids, is_target_lut):
+    # Class ids outside the model's range are never targets
+    cids = cls_ids.astype(np.int64)
+    mask = np.zeros(len(cids), dtype=bool)
+    in_range = (cids >= 0) & (cids < len(is_target_lut))
+    mask[in_range] = is_target_lut[cids[in_range]]
+    return mask
+
+
+def clamp_boxes(xyxy, w, h):
+    # Same as int() + clamp per coordinate: truncate toward zero, then clip into the frame
+    boxes = xyxy.astype(np.int64)
+    np.clip(boxes[:, 0::2], 0, w - 1, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, h - 1, out=boxes[:, 1::2])
+    return boxes
+
+
+def posture_hints(boxes):
+    # Very basic posture proxy: aspect ratio
+    bw = np.maximum(1, boxes[:, 2] - boxes[:, 0])
+    bh = np.maximum(1, boxes[:, 3] - boxes[:, 1])
+    ar = bh / bw
+    codes = np.where(ar > 2.2, 1, np.where(ar < 1.4, 2, 0))
+    return POSTURE_LABELS[codes]
+
+
+def child_by_scale_hints(person_heights, heights):
+    # Context hint only (does not change class): if much smaller than median, likely child
+    if person_heights.size == 0:
+        return np.zeros(len(heights), dtype=bool)
+    mid = person_heights.size // 2
+    median_h = np.partition(person_heights, mid)[mid]
+    return heights < 0.65 * median_h
+
+
+def motion_integral(prev_gray, gray):
+    # One frame diff per frame + its summed-area table; every box mean is then O(1)
+    if prev_gray is None or prev_gray.shape != gray.shape:
+        return None
+    diff = cv2.absdiff(prev_gray, gray)
+    return cv2.integral(diff, sdepth=cv2.CV_64F)
+
+
+def motion_scores_in_boxes(integral, boxes):
+    # Frame-diff based motion score per bbox (0..255 approx)
+    if integral is None or len(boxes) == 0:
+        return np.zeros(len(boxes), dtype=np.float64)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    total = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    area = (x2 - x1) * (y2 - y1)
+    return np.where(area > 0, total / np.maximum(area, 1), 0.0)
+
+
+def motion_scores_direct(prev_gray, gray, boxes):
+    # Same scores from per-box ROI diffs, no frame integral; cheaper for a few small boxes
+    scores = np.zeros(len(boxes), dtype=np.float64)
+    if prev_gray is None or prev_gray.shape != gray.shape:
+        return scores
+    for i, (x1, y1, x2, y2) in enumerate(boxes.tolist()):
+        if x2 > x1 and y2 > y1:
+            scores[i] = cv2.absdiff(prev_gray[y1:y2, x1:x2], gray[y1:y2, x1:x2]).mean()
+    return scores
+
+
+def motion_grid(integral, cols, rows):
+    # Downscaled motion map straight from the integral image (rows x cols cell means)
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    ys = np.linspace(0, h, rows + 1).astype(int)
+    xs = np.linspace(0, w, cols + 1).astype(int)
+    corners = integral[np.ix_(ys, xs)]
+    sums = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+    areas = np.maximum(1, np.outer(np.diff(ys), np.diff(xs)))
+    return sums / areas
+
+
+def postprocess_boxes(xyxy, cls_ids, w, h, is_target_lut, integral=None, prev_gray=None, gray=None):
+    """
+    Returns (idx, boxes, posture, motion, child) for the target boxes that are
+    still non-empty after clamping; idx indexes the tracker output arrays.
+    Motion comes from `integral` when given, else from per-box diffs of
+    prev_gray/gray (0 for every box when neither is given).
+    """
+    mask = target_mask(cls_ids, is_target_lut)
+    boxes = clamp_boxes(xyxy, w, h)
+    heights = boxes[:, 3] - boxes[:, 1]
+
+    # Median over every target box (before the empty-box filter), as the hint always did
+    person_heights = np.maximum(1, heights[mask])
+
+    keep = mask & (boxes[:, 2] > boxes[:, 0]) & (heights > 0)
+    idx = np.flatnonzero(keep)
+    kept = boxes[idx]
+    return (
+        idx,
+        kept,
+        posture_hints(kept),
+        motion_scores_in_boxes(integral, kept) if integral is not None or gray is None
+        else motion_scores_direct(prev_gray, gray, kept),
+        child_by_scale_hints(person_heights, heights[idx]),
+    )
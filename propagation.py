@@ -0,0 +1,102 @@
+"""
+Box propagation between detections (detect-every-N-frames mode).
+
+After a full detect + track frame, the tracked boxes are carried forward on
+the following frames with sparse Lucas-Kanade optical flow on the grayscale
+frames server.py already computes: a small grid of points per box, one
+pyramid LK call for all boxes (forward and backward, to reject bad points)
+and the median displacement per box. Boxes whose points all fail keep their
+last position. Track ids, confidences and classes stay those of the last
+detection.
+"""
+import cv2
+import numpy as np
+
+# Points per box side (GRID x GRID), inside the central part of the box
+GRID = 4
+INNER = 0.6
+FB_MAX_ERROR = 1.0  # px, forward-backward consistency
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def box_grid_points(xyxy, grid=GRID, inner=INNER):
+    """(N, grid*grid, 2) float32 sample points over the central `inner` share of each box."""
+    steps = (np.arange(grid, dtype=np.float32) + 0.5) / grid
+    offsets = (1 - inner) / 2 + inner * steps
+    cx = xyxy[:, 0:1] + (xyxy[:, 2:3] - xyxy[:, 0:1]) * offsets[None, :]
+    cy = xyxy[:, 1:2] + (xyxy[:, 3:4] - xyxy[:, 1:2]) * offsets[None, :]
+    xs = np.repeat(cx, grid, axis=1)
+    ys = np.tile(cy, (1, grid))
+    return np.stack([xs, ys], axis=2).astype(np.float32)
+
+
+def flow_shift_boxes(prev_gray, gray, xyxy):
+    """
+    Median optical-flow displacement per box, applied to the box.
+    Returns (shifted xyxy, per-box bool: True if the flow was usable).
+    """
+    n = len(xyxy)
+    if n == 0 or prev_gray is None or prev_gray.shape != gray.shape:
+        return xyxy, np.zeros(n, dtype=bool)
+
+    pts = box_grid_points(xyxy)
+    p0 = pts.reshape(-1, 1, 2)
+    p1, st, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, p0, None, **LK_PARAMS)
+    p0r, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, prev_gray, p1, None, **LK_PARAMS)
+
+    fb_error = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+    valid = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb_error < FB_MAX_ERROR)
+    delta = (p1 - p0).reshape(-1, 2)
+    delta[~valid] = np.nan
+    delta = delta.reshape(n, -1, 2)
+
+    ok = valid.reshape(n, -1).any(axis=1)
+    shift = np.zeros((n, 2), dtype=np.float32)
+    if ok.any():
+        shift[ok] = np.nanmedian(delta[ok], axis=1)
+
+    out = xyxy.copy()
+    out[:, 0::2] += shift[:, 0:1]
+    out[:, 1::2] += shift[:, 1:2]
+    return out, ok
+
+
+class TrackPropagator:
+    """
+    Per-stream state: the last tracked boxes ([x1, y1, x2, y2, (id,) conf, cls]
+    rows, as in Results.boxes.data) and how many frames ago they were detected.
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self.data = None
+        self.frames_since_detect = 0
+        self.detected_frames = 0
+        self.propagated_frames = 0
+
+    def due(self, stride):
+        # Detect on the first frame and then every `stride` frames
+        return self.data is None or stride <= 1 or self.frames_since_detect + 1 >= stride
+
+    def detected(self, data):
+        self.data = data.copy()
+        self.frames_since_detect = 0
+        self.detected_frames += 1
+
+    def propagate(self, prev_gray, gray):
+        """Moves the last boxes with optical flow; returns the updated rows."""
+        self.frames_since_detect += 1
+        self.propagated_frames += 1
+        if self.data is None or len(self.data) == 0:
+            return self.data
+        self.data[:, :4], _ = flow_shift_boxes(prev_gray, gray, self.data[:, :4])
+        return self.data
+
+    def stats(self, stride):
+        return {
+            "stride": stride,
+            "detected_frames": self.detected_frames,
+            "propagated_frames": self.propagated_frames,
+            "tracks": 0 if self.data is None else len(self.data),
+        }
@@ -1,14 +1,37 @@
+import time
+_BOOT_STARTED = time.perf_counter()  # before the heavy imports, for the startup breakdown
+
 from flask import Flask, request, jsonify, send_from_directory, Response
 from flask_cors import CORS
 import os
-import time
-import csv
+import threading
+import itertools
+import json
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
 import cv2
+import numpy as np
 import torch
-from ultralytics import YOLO
+
+from broadcast import BroadcastHub, FrameBroadcaster
+from crop_writer import CropWriter
+from delivery import PROFILE_LEVELS, AdaptiveDelivery, delivery_stats
+from detection_buffer import DetectionRing
+from detection_log import create_log_sink
+from inference_service import BatchInferenceService
+from jobs import JobManager
+from lifecycle import Lifecycle
+from model_backend import load_detector
+from motion_gate import MotionGate
+from pipeline import FramePipeline, pipeline_stats
+from postprocess import build_class_lut, motion_grid, motion_integral, postprocess_boxes
+from propagation import TrackPropagator
+from ultralytics.engine.results import Results
+
+# loading -> warming -> ready (or failed), reported on /ready
+lifecycle = Lifecycle(started=_BOOT_STARTED)
+lifecycle.phase_done("imports")
 
 app = Flask(__name__)
 CORS(app)
@@ -20,12 +43,29 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 # -----------------------------
 # Model + tracking configuration
 # -----------------------------
-model = YOLO("best.pt")
+# "torch" | "onnx" | "onnx-int8" | "openvino" | "openvino-int8" (exported once, cached in exports/)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch")
+model = load_detector("best.pt", backend=MODEL_BACKEND, imgsz=640, calib_dir=UPLOAD_FOLDER)
 print("[INFO] Model class names:", model.names)
+lifecycle.phase_done("model_load")
 
 DEVICE = 0 if torch.cuda.is_available() else "cpu"
 print(f"[INFO] Using device: {'GPU' if DEVICE == 0 else 'CPU'}")
 
+# One batched forward pass for all active streams, one tracker per stream
+INFERENCE_MAX_BATCH = 8
+INFERENCE_BATCH_WAIT_MS = 10
+inference_service = BatchInferenceService(
+    model,
+    max_batch=INFERENCE_MAX_BATCH,
+    max_wait_ms=INFERENCE_BATCH_WAIT_MS,
+    tracker_cfg="bytetrack.yaml",
+    imgsz=640,
+    conf=0.6,
+    iou=0.5,
+    device=DEVICE
+)
+
 # Deliverable folders
 BASE_SAVE_DIR = "detections"
 os.makedirs(BASE_SAVE_DIR, exist_ok=True)
@@ -36,118 +76,195 @@ TARGET_CLASSES = {"man", "woman", "child"}
 for cls in TARGET_CLASSES:
     os.makedirs(os.path.join(BASE_SAVE_DIR, cls), exist_ok=True)
 
-# Per-class counters + mapping (class, track_id) -> Human ID (Man1/Woman2/Child3)
+# class id -> is target / lower-cased name, built once instead of per box
+_IS_TARGET_LUT, _CLASS_NAME_LUT = build_class_lut(model.names, TARGET_CLASSES)
+
+# Crops: one kept crop per track per window, written off the inference thread
+CROP_POLICY = os.environ.get("CROP_POLICY", "confidence")  # "confidence" | "area"
+CROP_WINDOW_SECONDS = float(os.environ.get("CROP_WINDOW_SECONDS", 2.0))
+crop_writer = CropWriter(
+    BASE_SAVE_DIR,
+    policy=CROP_POLICY,
+    window_seconds=CROP_WINDOW_SECONDS,
+    workers=2,
+    max_pending=256
+)
+
+# Per-class counters + mapping (stream, class, track_id) -> Human ID (Man1/Woman2/Child3)
+# Streams run on their own threads, so both are only touched under _human_ids_lock
 class_counters = {cls: 0 for cls in TARGET_CLASSES}
 track_to_human_id = {}
+_human_ids_lock = threading.Lock()
+
+# Detection logging: batched writes, periodic flush, size/time rotation
+DETECTION_LOG_BACKEND = os.environ.get("DETECTION_LOG_BACKEND", "csv")  # "csv" | "sqlite"
+DETECTION_LOG_MAX_MB = float(os.environ.get("DETECTION_LOG_MAX_MB", 256))
+DETECTION_LOG_ROTATE_HOURS = float(os.environ.get("DETECTION_LOG_ROTATE_HOURS", 24))
+DETECTION_LOG_KEEP_FILES = int(os.environ.get("DETECTION_LOG_KEEP_FILES", 30))
+detection_log = create_log_sink(
+    DETECTION_LOG_BACKEND,
+    BASE_SAVE_DIR,
+    batch_size=500,
+    flush_interval=1.0,
+    max_bytes=int(DETECTION_LOG_MAX_MB * 1024 * 1024),
+    max_age_seconds=DETECTION_LOG_ROTATE_HOURS * 3600,
+    keep_files=DETECTION_LOG_KEEP_FILES
+)
+print(f"[INFO] Logging detections to: {detection_log.path}")
+
+# Stream pipeline sizing (capture -> inference -> encode)
+PIPELINE_QUEUE_SIZE = 4
+FILE_ENCODE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# Camera: one producer shared by every /video_feed client, stopped after the last one leaves
+CAMERA_INDEX = int(os.environ.get("CAMERA_INDEX", 0))
+BROADCAST_GRACE_SECONDS = float(os.environ.get("BROADCAST_GRACE_SECONDS", 3.0))
+broadcast_hub = BroadcastHub(grace_seconds=BROADCAST_GRACE_SECONDS)
+
+# MJPEG clients start on this profile and adapt to their measured send throughput
+DEFAULT_DELIVERY_PROFILE = os.environ.get("DELIVERY_PROFILE", "full")
+
+# Offline video jobs: how many run at once (the rest wait in the queue),
+# and how long / how many finished jobs stay listed
+JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", 2))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", 3600))
+JOB_MAX_FINISHED = int(os.environ.get("JOB_MAX_FINISHED", 100))
+
+# In-memory rolling detections for UI (fixed capacity, seq-numbered)
+detections = DetectionRing(capacity=80)
+
+# For simple motion score: previous gray frame per stream
+_prev_gray = {}
+
+# Optional coarse motion grid (mean abs frame diff per cell), latest per stream.
+# Opt-in: it costs a full-frame diff + integral image on every frame
+MOTION_GRID_ENABLED = os.environ.get("MOTION_GRID", "0") == "1"
+MOTION_GRID_COLS = 16
+MOTION_GRID_ROWS = 12
+_motion_grids = {}
+# Without the grid, box motion uses per-box diffs below this many boxes (a full-frame
+# integral only pays off with many boxes; see bench_postprocess.py)
+MOTION_INTEGRAL_MIN_BOXES = int(os.environ.get("MOTION_INTEGRAL_MIN_BOXES", 16))
+
+# Detection stride: full YOLO + ByteTrack every N frames, optical-flow propagation in between.
+# Overridable per stream id (e.g. "job-<id>") or per source label ("camera", "file") via /detect_stride
+DETECT_STRIDE = max(1, int(os.environ.get("DETECT_STRIDE", 1)))  # 1 = detect on every frame
+_detect_strides = {}
+_propagators = {}
+
+# Motion gate: skip YOLO while the scene is static and nothing is tracked (fixed cameras).
+# Wall-clock based, so only applied to live sources by default; empty MOTION_GATE_SOURCES disables it
+MOTION_GATE_SOURCES = {s for s in os.environ.get("MOTION_GATE_SOURCES", "camera").split(",") if s}
+MOTION_GATE_THRESHOLD = float(os.environ.get("MOTION_GATE_THRESHOLD", 8.0))      # max cell mean abs diff
+MOTION_GATE_MAX_SKIP_SECONDS = float(os.environ.get("MOTION_GATE_MAX_SKIP_SECONDS", 5.0))
+_motion_gates = {}
+
+# Unique id per running stream (keys tracker + motion state)
+_stream_counter = itertools.count(1)
+
+
+def _new_stream_id(source_label):
+    return f"{source_label}-{next(_stream_counter)}"
+
+
+def _release_stream(stream_id):
+    inference_service.release_stream(stream_id)
+    _prev_gray.pop(stream_id, None)
+    _motion_grids.pop(stream_id, None)
+    _propagators.pop(stream_id, None)
+    _motion_gates.pop(stream_id, None)
+    _detect_strides.pop(stream_id, None)
+    with _human_ids_lock:
+        for key in [k for k in track_to_human_id if k[0] == stream_id]:
+            del track_to_human_id[key]
+
+
+def _detect_stride(stream_id, source_label):
+    return _detect_strides.get(stream_id, _detect_strides.get(source_label, DETECT_STRIDE))
+
+
+def _get_human_id(stream_id: str, class_name: str, track_id: int) -> str:
+    key = (stream_id, class_name, int(track_id))
+    with _human_ids_lock:
+        if key not in track_to_human_id:
+            class_counters[class_name] += 1
+            track_to_human_id[key] = f"{class_name.capitalize()}{class_counters[class_name]}"
+        return track_to_human_id[key]
+
+
+def _append_detections(events):
+    # One batch per frame, so push subscribers wake up once per frame
+    detections.extend(events)
+
+
+def _run_track_on_frame(frame, source_label, frame_idx, stream_id=None, annotate=True):
+    annotated, _ = _track_frame(frame, source_label, frame_idx, stream_id, annotate)
+    return annotated
 
-# CSV logging
-CSV_PATH = os.path.join(BASE_SAVE_DIR, "tracking_log.csv")
-csv_file = open(CSV_PATH, "w", newline="", encoding="utf-8")
-csv_writer = csv.writer(csv_file)
-csv_writer.writerow([
-    "timestamp_iso", "source", "frame",
-    "class", "human_id", "track_id",
-    "conf", "x1", "y1", "x2", "y2",
-    "crop_path", "posture_hint", "motion_score", "child_by_scale_hint"
-])
-print(f"[INFO] Logging to CSV: {CSV_PATH}")
-
-# In-memory rolling detections for UI
-detections = []  # keep last N events
-
-# For simple motion score
-_prev_gray = None
-
-
-def _safe_lower_name(cls_id: int) -> str:
-    name = model.names.get(int(cls_id), str(cls_id))
-    return str(name).strip().lower()
-
-
-def _get_human_id(class_name: str, track_id: int) -> str:
-    key = (class_name, int(track_id))
-    if key not in track_to_human_id:
-        class_counters[class_name] += 1
-        track_to_human_id[key] = f"{class_name.capitalize()}{class_counters[class_name]}"
-    return track_to_human_id[key]
-
-
-def _clamp_box(x1, y1, x2, y2, w, h):
-    x1 = max(0, min(int(x1), w - 1))
-    x2 = max(0, min(int(x2), w - 1))
-    y1 = max(0, min(int(y1), h - 1))
-    y2 = max(0, min(int(y2), h - 1))
-    return x1, y1, x2, y2
-
-
-def _posture_hint_from_box(x1, y1, x2, y2):
-    # Very basic posture proxy: aspect ratio
-    bw = max(1, (x2 - x1))
-    bh = max(1, (y2 - y1))
-    ar = bh / bw
-    if ar > 2.2:
-        return "standing/upright"
-    if ar < 1.4:
-        return "crouched/sitting/unclear"
-    return "unknown"
-
-
-def _motion_score_in_box(prev_gray, gray, x1, y1, x2, y2):
-    # Frame-diff based motion score in the bbox (0..255 approx)
-    if prev_gray is None:
-        return 0.0
-    roi_prev = prev_gray[y1:y2, x1:x2]
-    roi_now = gray[y1:y2, x1:x2]
-    if roi_prev.size == 0 or roi_now.size == 0:
-        return 0.0
-    diff = cv2.absdiff(roi_prev, roi_now)
-    return float(diff.mean())
-
-
-def _child_by_scale_hint(person_heights, this_height):
-    # Context hint only (does not change class): if much smaller than median, likely child
-    if not person_heights:
-        return False
-    person_heights_sorted = sorted(person_heights)
-    mid = len(person_heights_sorted) // 2
-    median_h = person_heights_sorted[mid]
-    return this_height < 0.65 * median_h
-
-
-def _append_detection(event, max_keep=80):
-    global detections
-    detections.append(event)
-    detections = detections[-max_keep:]
-
-
-def _run_track_on_frame(frame, source_label, frame_idx):
+
+def _track_frame(frame, source_label, frame_idx, stream_id=None, annotate=True):
     """
-    Runs YOLOv8 + ByteTrack, saves crops, logs CSV, updates detections list.
-    Returns annotated_frame.
+    Runs YOLOv8 (batched across streams) + this stream's ByteTrack, saves crops,
+    logs CSV, appends UI events to the detections ring.
+    With a detection stride > 1, frames in between reuse the last tracks moved
+    by optical flow; rows and events say which ("origin": detected / propagated).
+    On gated sources, detection is skipped while the scene is static and empty.
+    Returns (annotated_frame, this frame's events); annotated_frame is None when
+    annotate=False (headless jobs, metadata streams).
     """
-    global _prev_gray
-
-    # Track
-    results = model.track(
-        source=frame,
-        imgsz=640,
-        conf=0.6,
-        iou=0.5,
-        device=DEVICE,
-        tracker="bytetrack.yaml",
-        persist=True,
-        verbose=False
-    )
-
-    r0 = results[0]
-    annotated = r0.plot()
+    if stream_id is None:
+        stream_id = source_label
 
     h, w = frame.shape[:2]
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    prev_gray = _prev_gray.get(stream_id)
+
+    propagator = _propagators.get(stream_id)
+    if propagator is None:
+        propagator = _propagators[stream_id] = TrackPropagator(source_label)
+
+    due = propagator.due(_detect_stride(stream_id, source_label))
+    detect_now = due
+    if due and source_label in MOTION_GATE_SOURCES:
+        gate = _motion_gates.get(stream_id)
+        if gate is None:
+            gate = _motion_gates[stream_id] = MotionGate(MOTION_GATE_THRESHOLD, MOTION_GATE_MAX_SKIP_SECONDS)
+        has_tracks = propagator.data is not None and len(propagator.data) > 0
+        detect_now = gate.should_detect(gray, has_tracks)
+
+    if detect_now:
+        # Track
+        r0 = inference_service.infer(stream_id, frame)
+        propagator.detected(
+            r0.boxes.data.detach().cpu().numpy() if r0.boxes is not None else np.zeros((0, 6), dtype=np.float32)
+        )
+        origin = "detected"
+    elif due:
+        # Gated: static scene, nothing tracked
+        r0 = Results(frame, path="", names=model.names, boxes=torch.zeros((0, 6)))
+        origin = "gated"
+    else:
+        data = propagator.propagate(prev_gray, gray)
+        r0 = Results(frame, path="", names=model.names, boxes=torch.from_numpy(data))
+        origin = "propagated"
+    annotated = r0.plot() if annotate else None
+
+    n_boxes = 0 if r0.boxes is None else len(r0.boxes)
+    integral = None
+    if MOTION_GRID_ENABLED or n_boxes >= MOTION_INTEGRAL_MIN_BOXES:
+        integral = motion_integral(prev_gray, gray)
+    if MOTION_GRID_ENABLED and integral is not None:
+        _motion_grids[stream_id] = {
+            "source": source_label,
+            "frame": frame_idx,
+            "cols": MOTION_GRID_COLS,
+            "rows": MOTION_GRID_ROWS,
+            "cells": np.round(motion_grid(integral, MOTION_GRID_COLS, MOTION_GRID_ROWS), 2).tolist()
+        }
 
-    if r0.boxes is None or len(r0.boxes) == 0:
-        _prev_gray = gray
-        return annotated
+    if n_boxes == 0:
+        _prev_gray[stream_id] = gray
+        return annotated, []
 
     xyxy = r0.boxes.xyxy.detach().cpu().numpy()
     cls_ids = r0.boxes.cls.detach().cpu().numpy()
@@ -157,67 +274,61 @@ def _run_track_on_frame(frame, source_label, frame_idx):
     if track_ids is not None:
         track_ids = track_ids.detach().cpu().numpy()
 
-    # Build person heights for contextual "child_by_scale_hint"
-    person_heights = []
-    for i, (box, cid) in enumerate(zip(xyxy, cls_ids)):
-        cname = _safe_lower_name(cid)
-        if cname in TARGET_CLASSES:
-            x1, y1, x2, y2 = _clamp_box(*box, w=w, h=h)
-            person_heights.append(max(1, y2 - y1))
-
-    timestamp_iso = datetime.now().isoformat(timespec="milliseconds")
-    timestamp_file = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-
-    for i, (box, cid) in enumerate(zip(xyxy, cls_ids)):
-        class_name = _safe_lower_name(cid)
-        if class_name not in TARGET_CLASSES:
-            continue
-
-        x1, y1, x2, y2 = _clamp_box(*box, w=w, h=h)
-        if x2 <= x1 or y2 <= y1:
-            continue
-
-        conf = float(confs[i]) if confs is not None else None
-        tid = int(track_ids[i]) if track_ids is not None else int(i)
-
-        human_id = _get_human_id(class_name, tid)
-
-        # Crop + save
-        crop = frame[y1:y2, x1:x2]
-        crop_rel = os.path.join(BASE_SAVE_DIR, class_name, f"{timestamp_file}_{human_id}.jpg")
-        crop_abs = os.path.abspath(crop_rel)
-        cv2.imwrite(crop_rel, crop)
-
-        # Minimal posture/behavior fusion (hint only)
-        posture_hint = _posture_hint_from_box(x1, y1, x2, y2)
-        motion_score = _motion_score_in_box(_prev_gray, gray, x1, y1, x2, y2)
-        child_scale_hint = _child_by_scale_hint(person_heights, (y2 - y1))
-
-        # Overlay ID + conf
-        label = f"{human_id}"
-        if conf is not None:
-            label += f" {conf:.2f}"
-        cv2.putText(
-            annotated,
-            label,
-            (x1, max(15, y1 - 8)),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            2,
-            cv2.LINE_AA
+    # Whole-frame array work: target mask, clamping, median height, hints, motion
+    idx, boxes, postures, motions, child_hints = postprocess_boxes(
+        xyxy, cls_ids, w, h, _IS_TARGET_LUT, integral, prev_gray, gray
+    )
+    cids = cls_ids[idx].astype(np.int64)
+    class_names = _CLASS_NAME_LUT[cids].tolist()
+    boxes = boxes.tolist()
+    postures = postures.tolist()
+    motions = motions.tolist()
+    child_hints = child_hints.tolist()
+    conf_list = confs[idx].tolist() if confs is not None else [None] * len(idx)
+    tid_list = track_ids[idx].astype(np.int64).tolist() if track_ids is not None else idx.tolist()
+
+    now = datetime.now()
+    timestamp_iso = now.isoformat(timespec="milliseconds")
+
+    # Per box: only IDs, crops, overlay, log rows and events
+    frame_events = []
+    for class_name, (x1, y1, x2, y2), posture_hint, motion_score, child_scale_hint, conf, tid in zip(
+            class_names, boxes, postures, motions, child_hints, conf_list, tid_list):
+        human_id = _get_human_id(stream_id, class_name, tid)
+
+        # Crop: best one per track per window, saved in the background (None if dropped)
+        crop_rel = crop_writer.submit(
+            (stream_id, class_name, tid), class_name, human_id,
+            frame, (x1, y1, x2, y2), conf, now=now.timestamp()
         )
 
-        # CSV
-        csv_writer.writerow([
+        # Overlay ID + conf
+        if annotated is not None:
+            label = f"{human_id}"
+            if conf is not None:
+                label += f" {conf:.2f}"
+            cv2.putText(
+                annotated,
+                label,
+                (x1, max(15, y1 - 8)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (255, 255, 255),
+                2,
+                cv2.LINE_AA
+            )
+
+        # Log row (buffered, see detection_log.py)
+        detection_log.write([
             timestamp_iso, source_label, frame_idx,
             class_name, human_id, tid,
             conf if conf is not None else "",
             x1, y1, x2, y2,
-            crop_rel,
+            crop_rel or "",
             posture_hint,
             f"{motion_score:.2f}",
-            int(child_scale_hint)
+            int(child_scale_hint),
+            origin
         ])
 
         # UI event payload
@@ -230,86 +341,400 @@ def _run_track_on_frame(frame, source_label, frame_idx):
             "track_id": tid,
             "confidence": conf,
             "bbox": [x1, y1, x2, y2],
-            "crop_url": f"/{crop_rel.replace(os.sep, '/')}",
+            "crop_url": f"/{crop_rel.replace(os.sep, '/')}" if crop_rel else None,
             "posture_hint": posture_hint,
             "motion_score": motion_score,
-            "child_by_scale_hint": child_scale_hint
+            "child_by_scale_hint": child_scale_hint,
+            "origin": origin
         }
-        _append_detection(event)
+        frame_events.append(event)
 
-    _prev_gray = gray
-    return annotated
+    _append_detections(frame_events)
+    _prev_gray[stream_id] = gray
+    return annotated, frame_events
 
 
-def generate_frames(mode='processed'):
-    # preserves your original endpoint behavior
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    if not cap.isOpened():
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-        return
+# Event fields sent per box in metadata streams (the browser draws the overlay)
+FRAME_METADATA_FIELDS = ("bbox", "label", "human_id", "track_id", "confidence", "origin", "child_by_scale_hint")
 
-    frame_idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        if mode == 'processed':
-            annotated_frame = _run_track_on_frame(frame, source_label="camera", frame_idx=frame_idx)
-        else:
-            annotated_frame = frame
+def _frame_metadata(frame, source_label, frame_idx, events):
+    h, w = frame.shape[:2]
+    return {
+        "frame": frame_idx,
+        "source": source_label,
+        "width": w,
+        "height": h,
+        "timestamp": events[0]["timestamp"] if events else datetime.now().isoformat(timespec="milliseconds"),
+        "detections": [{k: e[k] for k in FRAME_METADATA_FIELDS} for e in events]
+    }
+
+
+def _run_job_frame(frame, frame_idx, stream_id):
+    # Same source as /video_file_feed, so detection queries by source cover both
+    _run_track_on_frame(frame, source_label="file", frame_idx=frame_idx, stream_id=stream_id, annotate=False)
+
+
+job_manager = JobManager(
+    _run_job_frame,
+    release_stream=_release_stream,
+    max_workers=JOB_MAX_WORKERS,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    retention_seconds=JOB_RETENTION_SECONDS,
+    max_finished=JOB_MAX_FINISHED
+)
+
+
+def _multipart_frame(frame_bytes):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+
+def _multipart_metadata_frame(metadata, frame_bytes=None):
+    # JSON part + JPEG part, both keyed by frame index and sized, so clients can parse without scanning.
+    # Frames the delivery profile drops still send their JSON part (no JPEG)
+    body = json.dumps(metadata).encode("utf-8")
+    idx = str(metadata["frame"]).encode("ascii")
+    part = (b'--frame\r\n'
+            b'Content-Type: application/json\r\n'
+            b'X-Frame-Index: ' + idx + b'\r\n'
+            b'Content-Length: ' + str(len(body)).encode("ascii") + b'\r\n\r\n' + body + b'\r\n')
+    if not frame_bytes:
+        return part
+    return part + (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n'
+                   b'X-Frame-Index: ' + idx + b'\r\n'
+                   b'Content-Length: ' + str(len(frame_bytes)).encode("ascii") + b'\r\n\r\n' + frame_bytes + b'\r\n')
+
+
+def _camera_broadcaster():
+    stream_id = _new_stream_id("camera")
+
+    def process(frame, frame_idx, modes):
+        # Inference only runs while someone watches the processed or metadata stream;
+        # boxes are only drawn when someone watches the processed one
+        images = {"raw": frame}
+        metadata = None
+        if "processed" in modes or "meta" in modes:
+            annotated, events = _track_frame(
+                frame, source_label="camera", frame_idx=frame_idx, stream_id=stream_id,
+                annotate="processed" in modes
+            )
+            if annotated is not None:
+                images["processed"] = annotated
+            images["meta"] = frame  # same image as raw, encoded once for both
+            metadata = _frame_metadata(frame, "camera", frame_idx, events)
+        return images, metadata
+
+    return FrameBroadcaster(
+        stream_id,
+        open_capture=lambda: cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW),
+        process=process,
+        on_stop=lambda: _release_stream(stream_id)
+    )
 
-        ok, buffer = cv2.imencode('.jpg', annotated_frame)
-        if not ok:
-            continue
-        frame_bytes = buffer.tobytes()
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+def _delivery_from_request(name):
+    """
+    Per-client delivery profile: ?profile=full|high|medium|low|minimal picks the
+    starting point (default full), ?adaptive=0 pins it.
+    """
+    profile = request.args.get('profile', DEFAULT_DELIVERY_PROFILE)
+    if profile not in PROFILE_LEVELS:
+        profile = DEFAULT_DELIVERY_PROFILE
+    adaptive = request.args.get('adaptive', '1') != '0'
+    return AdaptiveDelivery(name, profile=profile, adaptive=adaptive)
+
 
-        frame_idx += 1
+def generate_frames(mode='processed', delivery=None):
+    """
+    preserves your original endpoint behavior; every client shares one camera producer.
+    mode=meta: raw frames + per-frame JSON (boxes, IDs, confidences), overlay drawn by the client.
+    """
+    if mode not in ('processed', 'meta'):
+        mode = 'raw'
+    if delivery is None:
+        delivery = AdaptiveDelivery(f"camera-{mode}")
+    sent = False
+    with delivery:
+        frames = broadcast_hub.subscribe(
+            f"camera:{CAMERA_INDEX}", mode, _camera_broadcaster, delivery, with_metadata=(mode == 'meta')
+        )
+        for item in frames:
+            sent = True
+            if mode == 'meta':
+                frame_bytes, metadata = item
+                yield _multipart_metadata_frame(metadata, frame_bytes)
+            else:
+                yield _multipart_frame(item)
+    if not sent:
+        # Camera could not be opened
+        yield _multipart_frame(b'')
 
 
 @app.route('/video_feed')
 def video_feed():
     mode = request.args.get('mode', 'processed')
-    return Response(generate_frames(mode), mimetype='multipart/x-mixed-replace; boundary=frame')
+    delivery = _delivery_from_request(f"camera-{mode}")
+    mimetype = 'multipart/mixed; boundary=frame' if mode == 'meta' else 'multipart/x-mixed-replace; boundary=frame'
+    return Response(generate_frames(mode, delivery), mimetype=mimetype)
 
 
 @app.route('/get_detections')
 def get_detections():
-    # returns last N events for UI
-    return jsonify(detections)
+    """
+    Without ?since: the last N events as a plain list (original behavior).
+    With ?since=<seq>: only newer events plus the cursor to send next time,
+    optionally filtered by &source= and &class=.
+    """
+    since = request.args.get('since')
+    source = request.args.get('source') or None
+    label = (request.args.get('class') or '').strip().lower() or None
+    if since is None:
+        events, _, _ = detections.since(0, source=source, label=label)
+        return jsonify(events)
+    try:
+        since = max(0, int(since))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    events, cursor, truncated = detections.since(since, source=source, label=label)
+    return jsonify({'cursor': cursor, 'events': events, 'truncated': truncated})
 
 
-def generate_file_frames(file_path):
-    cap = cv2.VideoCapture(file_path)
-    frame_idx = 0
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 0:
-        fps = 30.0
-    delay = 1.0 / fps
+def _sse_message(event_name, data, event_id=None):
+    msg = ""
+    if event_id is not None:
+        msg += f"id: {event_id}\n"
+    msg += f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+    return msg
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        annotated_frame = _run_track_on_frame(frame, source_label="file", frame_idx=frame_idx)
-
-        ok, buffer = cv2.imencode('.jpg', annotated_frame)
-        if not ok:
+def generate_detection_events(since, source=None, label=None, keepalive=15.0):
+    """
+    Server-Sent Events: one "detections" message per (source, frame) batch.
+    Each client reads the ring at its own pace, so a slow client never holds
+    events in a per-client queue: if it falls more than the ring's capacity
+    behind, it gets a "gap" message and continues from the oldest retained event.
+    """
+    cursor = since
+    yield "retry: 2000\n\n"
+    while True:
+        new_cursor = detections.wait(cursor, timeout=keepalive)
+        if new_cursor == cursor:
+            yield ": keepalive\n\n"
             continue
-        frame_bytes = buffer.tobytes()
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        events, new_cursor, truncated = detections.since(cursor, source=source, label=label)
+        if truncated:
+            yield _sse_message("gap", {"since": cursor, "cursor": new_cursor})
+
+        # Coalesce per frame
+        batch = []
+        for event in events:
+            if batch and (event["source"], event["frame"]) != (batch[0]["source"], batch[0]["frame"]):
+                yield _sse_message("detections", {"cursor": batch[-1]["seq"], "events": batch}, batch[-1]["seq"])
+                batch = []
+            batch.append(event)
+        if batch:
+            yield _sse_message("detections", {"cursor": new_cursor, "events": batch}, new_cursor)
+        elif new_cursor != cursor:
+            # Everything new was filtered out; still move the client's resume point
+            yield f"id: {new_cursor}\n\n"
+        cursor = new_cursor
+
+
+@app.route('/detections/stream')
+def stream_detections():
+    """
+    Push channel for detection events (text/event-stream).
+    Resume with ?since=<seq> or the Last-Event-ID header EventSource sends on reconnect.
+    Optional &source= and &class= filters.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since', 0)
+    try:
+        since = max(0, int(since))
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    source = request.args.get('source') or None
+    label = (request.args.get('class') or '').strip().lower() or None
+    return Response(
+        generate_detection_events(since, source=source, label=label),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/detections/query')
+def query_detections():
+    """
+    Filtered read of the detection log without loading it whole.
+    ?start=&end= (ISO timestamps), &class=, &human_id=, &source=, &limit= (default 1000, max 10000)
+    """
+    try:
+        limit = min(10000, max(1, int(request.args.get('limit', 1000))))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    rows = detection_log.query(
+        start=request.args.get('start'),
+        end=request.args.get('end'),
+        class_name=request.args.get('class'),
+        human_id=request.args.get('human_id'),
+        source=request.args.get('source'),
+        limit=limit
+    )
+    return jsonify({'count': len(rows), 'rows': rows})
 
-        frame_idx += 1
-        time.sleep(delay)
 
-    cap.release()
+@app.route('/motion_grid')
+def get_motion_grid():
+    # latest coarse motion map per stream (?stream=<id> for one)
+    if not MOTION_GRID_ENABLED:
+        return jsonify({'error': 'Motion grid is disabled (set MOTION_GRID=1)'}), 404
+    stream_id = request.args.get('stream')
+    if stream_id:
+        grid = _motion_grids.get(stream_id)
+        if grid is None:
+            return jsonify({'error': 'Unknown stream'}), 404
+        return jsonify(grid)
+    return jsonify(dict(_motion_grids))
+
+
+@app.route('/pipeline_stats')
+def get_pipeline_stats():
+    # queue depths + per-stage timings of every running stream
+    return jsonify(pipeline_stats())
+
+
+@app.route('/detect_stride', methods=['GET', 'POST'])
+def detect_stride():
+    """
+    GET: default stride, overrides and detected / propagated frame counts per stream.
+    POST {"stride": N, "stream_id": "camera-1"} or {"stride": N, "source": "camera"};
+    stride 1 detects on every frame, omit stride (null) to remove the override.
+    """
+    if request.method == 'POST':
+        data = request.json or {}
+        key = data.get('stream_id') or data.get('source')
+        if not key:
+            return jsonify({'error': 'stream_id or source required'}), 400
+        stride = data.get('stride')
+        if stride is None:
+            _detect_strides.pop(key, None)
+        else:
+            try:
+                stride = int(stride)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid stride'}), 400
+            if stride < 1:
+                return jsonify({'error': 'Invalid stride'}), 400
+            _detect_strides[key] = stride
+    return jsonify({'default': DETECT_STRIDE, 'overrides': dict(_detect_strides), 'streams': _stream_stats()})
+
+
+def _stream_stats():
+    streams = {}
+    for stream_id, propagator in list(_propagators.items()):
+        stats = propagator.stats(_detect_stride(stream_id, propagator.source))
+        gate = _motion_gates.get(stream_id)
+        stats["motion_gate"] = gate.stats() if gate is not None else None
+        streams[stream_id] = stats
+    return streams
+
+
+@app.route('/stream_stats')
+def get_stream_stats():
+    # per stream: detection stride, detected / propagated frames, motion-gate counters
+    return jsonify(_stream_stats())
+
+
+@app.route('/broadcast_stats')
+def get_broadcast_stats():
+    # shared camera producers and their subscribers per mode
+    return jsonify(broadcast_hub.stats())
+
+
+@app.route('/delivery_stats')
+def get_delivery_stats():
+    # per-client MJPEG profile, send time and throughput
+    return jsonify(delivery_stats())
+
+
+@app.route('/inference_stats')
+def get_inference_stats():
+    # batch sizes + forward-pass timing of the shared inference worker
+    return jsonify(inference_service.stats())
+
+
+@app.route('/crop_stats')
+def get_crop_stats():
+    # kept / written / dropped crops of the background writer
+    return jsonify(crop_writer.stats())
+
+
+def generate_file_frames(file_path, delivery=None, mode='processed'):
+    # mode=meta: raw frames + per-frame JSON instead of server-drawn boxes
+    cap = cv2.VideoCapture(file_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 0:
+        fps = 30.0
+
+    stream_id = _new_stream_id("file")
+    if delivery is None:
+        delivery = AdaptiveDelivery(stream_id)
+
+    # Frames over the profile's fps are dropped before the encode stage (on the file's
+    # clock, in frame order); b"" keeps their slot so playback pacing is unchanged
+    if mode == 'meta':
+        def process(frame, frame_idx):
+            _, events = _track_frame(frame, source_label="file", frame_idx=frame_idx, stream_id=stream_id, annotate=False)
+            return frame, _frame_metadata(frame, "file", frame_idx, events), delivery.due_at(frame_idx / fps)
+
+        def encode(out):
+            frame, metadata, due = out
+            return (delivery.encode(frame) if due else b""), metadata
+    else:
+        def process(frame, frame_idx):
+            annotated = _run_track_on_frame(frame, source_label="file", frame_idx=frame_idx, stream_id=stream_id)
+            return annotated, delivery.due_at(frame_idx / fps)
+
+        def encode(out):
+            annotated, due = out
+            return delivery.encode(annotated) if due else b""
+
+    # File source: no drops, decode/inference/encode overlap across cores;
+    # encode follows the client's current delivery profile
+    # The stream state is released from the inference stage once its last frame is done
+    pipeline = FramePipeline(
+        stream_id, cap, process=process, encode=encode, live=False,
+        queue_size=PIPELINE_QUEUE_SIZE, encode_workers=FILE_ENCODE_WORKERS,
+        on_stop=lambda: _release_stream(stream_id)
+    )
+    frames = pipeline.frames(pace_fps=fps)
+    try:
+        with delivery:
+            for item in frames:
+                # Every frame is still tracked and logged; only delivery is thinned out
+                if mode == 'meta':
+                    frame_bytes, metadata = item
+                else:
+                    frame_bytes = item
+                # Not due when inferred (or the encode failed); sends falling behind the
+                # profile's interval skip the frames in between
+                if not frame_bytes or not delivery.due():
+                    if mode == 'meta':
+                        # The JSON stream stays gapless, only the JPEG is left out
+                        yield _multipart_metadata_frame(metadata)
+                    continue
+                if mode == 'meta':
+                    part = _multipart_metadata_frame(metadata, frame_bytes)
+                else:
+                    part = _multipart_frame(frame_bytes)
+                t0 = time.perf_counter()
+                yield part
+                delivery.record(len(part), time.perf_counter() - t0, started=t0)
+    finally:
+        # Stops and joins the stages (running on_stop) before the generator returns
+        frames.close()
 
 
 @app.route('/video_file_feed')
@@ -317,7 +742,10 @@ def video_file_feed():
     file_path = request.args.get('file_path')
     if not file_path or not os.path.exists(file_path):
         return "File not found", 404
-    return Response(generate_file_frames(file_path), mimetype='multipart/x-mixed-replace; boundary=frame')
+    mode = request.args.get('mode', 'processed')
+    delivery = _delivery_from_request(f"file-{os.path.basename(file_path)}")
+    mimetype = 'multipart/mixed; boundary=frame' if mode == 'meta' else 'multipart/x-mixed-replace; boundary=frame'
+    return Response(generate_file_frames(file_path, delivery, mode), mimetype=mimetype)
 
 
 @app.route('/')
@@ -345,6 +773,41 @@ def upload_file():
     return jsonify({'file_path': file_path})
 
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Headless, unpaced processing of an uploaded video.
+    Body: {"file_path": <path returned by /upload>}
+    """
+    data = request.json or {}
+    file_path = data.get('file_path')
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({'error': 'Invalid file_path'}), 400
+    job = job_manager.submit(file_path)
+    return jsonify(job.as_dict()), 202
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify([job.as_dict() for job in job_manager.list()])
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.as_dict())
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.as_dict())
+
+
 @app.route('/run_detection', methods=['POST'])
 def run_detection():
     """
@@ -374,12 +837,58 @@ def run_detection():
     return jsonify({'error': 'Invalid mode'}), 400
 
 
+@app.route('/health')
+def health():
+    # liveness: the process is up and serving requests
+    return jsonify({'status': 'alive', 'state': lifecycle.state})
+
+
+@app.route('/ready')
+def ready():
+    # readiness: 200 once the model is loaded and warmed up, 503 before (or if warm-up failed)
+    status = lifecycle.as_dict()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+
+# -----------------------------
+# Warm-up
+# -----------------------------
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") == "1"
+WARMUP_FRAMES = 2
+
+
+def _warm_up():
+    """
+    Pushes a dummy frame through the shared inference path (predictor setup,
+    tracker, first-call kernel init), so the first real frame is not the slow one.
+    """
+    lifecycle.phase_done("setup")
+    lifecycle.set_state("warming")
+    try:
+        if WARMUP_ENABLED:
+            dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+            for _ in range(WARMUP_FRAMES):
+                inference_service.infer("warmup", dummy)
+            inference_service.release_stream("warmup")
+            cv2.imencode('.jpg', dummy)
+        lifecycle.phase_done("warmup")
+        lifecycle.set_state("ready")
+        print(f"[INFO] Server ready. Startup: {lifecycle.summary()}")
+    except Exception as e:
+        lifecycle.set_state("failed", e)
+        print(f"[ERROR] Warm-up failed: {e}")
+
+
+threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+
+
 if __name__ == '__main__':
     try:
         app.run(debug=True)
     finally:
-        # Ensure CSV closes
+        # Ensure queued crops land on disk and the detection log is flushed
         try:
-            csv_file.close()
+            crop_writer.flush()
+            detection_log.close()
         except Exception:
             pass
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Bounded, array-backed history for fixed_colab sessions.
+
+- Behaviors are stored as small integer codes (one vocabulary shared by all
+  sessions) in a run-length encoded timeline: a kiosk where someone stands
+  for an hour costs one run, not 50k strings.
+- Movement scores live in float32 ring buffers.
+- Every buffer is capped (oldest entries are overwritten), and grows up to
+  its cap on demand, so short sessions stay small.
+- Per-behavior counts and the total frame count are kept for the whole
+  session, even after old entries were overwritten.
+"""
+import threading
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(min(self.capacity, INITIAL_CAPACITY), dtype=dtype)
+        self._start = 0
+        self._len = 0
+        self.total = 0  # appended since creation, including overwritten ones
+
+    def __len__(self):
+        return self._len
+
+    def append(self, value):
+        size = len(self._data)
+        if self._len == size and size < self.capacity:
+            # Still linear (no wrap before reaching the cap): grow in place
+            grown = np.zeros(min(self.capacity, size * 2), dtype=self._data.dtype)
+            grown[:size] = self._data
+            self._data = grown
+            size = len(grown)
+        self._data[(self._start + self._len) % size] = value
+        if self._len < size:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % size
+        self.total += 1
+
+    def last(self):
+        return self._data[(self._start + self._len - 1) % len(self._data)]
+
+    def set_last(self, value):
+        self._data[(self._start + self._len - 1) % len(self._data)] = value
+
+    def values(self):
+        """Chronological copy of the retained entries."""
+        end = self._start + self._len
+        if end <= len(self._data):
+            return self._data[self._start:end].copy()
+        return np.concatenate((self._data[self._start:], self._data[:end - len(self._data)]))
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+
+class BehaviorVocabulary:
+    """Label <-> small integer code, shared by every session."""
+
+    def __init__(self):
+        self._codes = {}
+        self._labels = []
+        self._lock = threading.Lock()
+
+    def code(self, label):
+        code = self._codes.get(label)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(label)
+                if code is None:
+                    code = len(self._labels)
+                    self._labels.append(label)
+                    self._codes[label] = code
+        return code
+
+    def label(self, code):
+        return self._labels[code]
+
+    def labels(self, codes=None):
+        """Labels for `codes`, or all labels indexed by code."""
+        if codes is None:
+            return list(self._labels)
+        return [self._labels[c] for c in codes]
+
+
+BEHAVIOR_CODES = BehaviorVocabulary()
+
+
+class BehaviorTimeline:
+    """Run-length encoded behavior codes, at most `max_runs` runs retained."""
+
+    def __init__(self, max_runs):
+        self.codes = RingBuffer(max_runs, dtype=np.uint16)
+        self.lengths = RingBuffer(max_runs, dtype=np.uint32)
+        self.counts = {}  # code -> frames, whole session
+        self.frames = 0
+
+    def append(self, code):
+        if len(self.codes) and self.codes.last() == code:
+            self.lengths.set_last(self.lengths.last() + 1)
+        else:
+            self.codes.append(code)
+            self.lengths.append(1)
+        self.counts[code] = self.counts.get(code, 0) + 1
+        self.frames += 1
+
+    def runs(self):
+        """(codes, lengths) arrays of the retained runs, oldest first."""
+        return self.codes.values(), self.lengths.values()
+
+    def expand(self):
+        """Per-frame codes of the retained runs."""
+        codes, lengths = self.runs()
+        return np.repeat(codes, lengths)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.lengths.nbytes
+
+
+class SessionHistory:
+    def __init__(self, max_frames, max_runs, vocabulary=BEHAVIOR_CODES):
+        self.vocabulary = vocabulary
+        self.timeline = BehaviorTimeline(max_runs)
+        self.scores = RingBuffer(max_frames)
+        self.raw_scores = RingBuffer(max_frames)
+        # Frame workers append while /generate-graphs takes snapshots
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.timeline.frames
+
+    @property
+    def version(self):
+        # Grows with every append; cached graphs are keyed on it
+        return self.timeline.frames
+
+    def append(self, behavior, raw_score, score):
+        code = self.vocabulary.code(behavior)
+        with self._lock:
+            self.timeline.append(code)
+            self.raw_scores.append(raw_score)
+            self.scores.append(score)
+
+    def behaviors(self):
+        """Per-frame behavior labels of the retained timeline."""
+        return self.vocabulary.labels(self.timeline.expand())
+
+    def counts(self):
+        """{behavior: frames} over the whole session."""
+        return {self.vocabulary.label(code): n for code, n in list(self.timeline.counts.items())}
+
+    @property
+    def nbytes(self):
+        return self.timeline.nbytes + self.scores.nbytes + self.raw_scores.nbytes
+
+    def snapshot(self):
+        """Consistent copies of everything the graphs need (taken under the append lock)."""
+        with self._lock:
+            frames = self.timeline.frames
+            codes, lengths = self.timeline.runs()
+            scores = self.scores.values()
+            scores_total = self.scores.total
+            counts = self.counts()
+        return {
+            "frames": frames,
+            "counts": counts,
+            "labels": self.vocabulary.labels(),
+            "codes": codes,
+            "lengths": lengths,
+            # Frame number of the first retained run / score
+            "timeline_offset": max(0, frames - int(lengths.sum())),
+            "scores": scores,
+            "scores_offset": max(0, scores_total - len(scores)),
+        }
+
+    def stats(self):
+        return {
+            "frames": len(self),
+            "runs": len(self.timeline.codes),
+            "runs_dropped": self.timeline.codes.total - len(self.timeline.codes),
+            "scores_retained": len(self.scores),
+            "history_bytes": self.nbytes,
+        }
@@ -4,12 +4,62 @@ Unified startup script for Drone Tech AI Portal
 Runs both server.py (port 5000) and run_dev.py (port 8000) simultaneously
 """
 
+import json
 import subprocess
 import sys
 import time
 import os
+import urllib.error
+import urllib.request
 from pathlib import Path
 
+# Readiness endpoints polled after launch (Flask: model loaded + warmed up)
+FLASK_READY_URL = "http://127.0.0.1:5000/ready"
+FASTAPI_READY_URL = "http://127.0.0.1:8000/health"
+READY_TIMEOUT = 180  # seconds
+READY_POLL_INTERVAL = 0.5
+
+
+def wait_until_ready(checks, timeout=READY_TIMEOUT):
+    """
+    checks: [(name, url, process)]. Polls every url until it answers 200,
+    a process exits or the timeout passes. Returns False if a process exited
+    during startup; servers still loading at the timeout are let through.
+    """
+    pending = list(checks)
+    exited = []
+    t0 = time.time()
+    while pending and not exited and time.time() - t0 < timeout:
+        for check in list(pending):
+            name, url, process = check
+            if process.poll() is not None:
+                print(f"❌ {name} exited before becoming ready (code {process.returncode})")
+                pending.remove(check)
+                exited.append(name)
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=2) as resp:
+                    body = resp.read().decode("utf-8", "replace")
+            except (urllib.error.URLError, OSError):
+                continue  # not listening yet, or 503 while loading / warming up
+            print(f"✅ {name} ready after {time.time() - t0:.1f}s")
+            try:
+                timings = json.loads(body).get("startup_timings_s")
+            except (ValueError, AttributeError):
+                timings = None
+            if timings:
+                total = timings.pop("total", None)
+                line = ", ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+                print(f"   startup: {line}" + (f" (total {total:.2f}s)" if total is not None else ""))
+            pending.remove(check)
+        time.sleep(READY_POLL_INTERVAL)
+
+    if exited:
+        return False
+    for name, _, process in pending:
+        print(f"⚠️  {name} not ready after {timeout}s, continuing anyway")
+    return True
+
 def run_servers():
     """Start both servers in parallel"""
     print("=" * 70)
@@ -42,9 +92,6 @@ def run_servers():
         )
         processes.append(("Flask (Port 5000)", flask_process))
         
-        # Wait longer for Flask to initialize
-        time.sleep(3)
-        
         # Start run_dev.py on port 8000
         print("[2/2] Starting FastAPI server on port 8000...")
         fastapi_process = subprocess.Popen(
@@ -58,9 +105,19 @@ def run_servers():
         processes.append(("FastAPI (Port 8000)", fastapi_process))
         
         print()
-        print("✅ Both servers are starting...")
+        print("⏳ Waiting for both servers to report ready...")
+        print()
+        ready = wait_until_ready([
+            ("Flask (Port 5000)", FLASK_READY_URL, flask_process),
+            ("FastAPI (Port 8000)", FASTAPI_READY_URL, fastapi_process),
+        ])
+        if not ready:
+            print("Terminating all servers...")
+            for _, proc in processes:
+                if proc.poll() is None:
+                    proc.terminate()
+            sys.exit(1)
         print()
-        time.sleep(6)  # Wait longer for FastAPI to load ML models
         
         # Monitor both processes
         print("📊 Server Output:")
@@ -28,6 +28,15 @@ const FRAME_INTERVAL = 1000 / TARGET_FPS;
 let frameQueue = [];
 const MAX_QUEUE_SIZE = 2; // Limit queue to prevent backlog
 
+// Binary frame protocol (raw JPEG + 32-byte header instead of base64 data URLs)
+// Header: "BT" | version u8 | flags u8 | frame id u32 | timestamp f64 | session uuid (16 bytes)
+const USE_BINARY_PROTOCOL = true;
+const FRAME_HEADER_SIZE = 32;
+const FRAME_VERSION = 1;
+const FLAG_WANT_FRAME = 0x01;
+let frameId = 0;
+let sessionTag = null;
+
 // Event Listeners
 document.addEventListener("DOMContentLoaded", initializeApp);
 startButton.addEventListener("click", startTracking);
@@ -73,6 +82,29 @@ function generateUUID() {
   });
 }
 
+// 16-byte form of the session UUID for the binary frame header
+function uuidToBytes(uuid) {
+  const hex = uuid.replace(/-/g, "");
+  const bytes = new Uint8Array(16);
+  for (let i = 0; i < 16; i++) {
+    bytes[i] = parseInt(hex.substr(i * 2, 2), 16);
+  }
+  return bytes;
+}
+
+function encodeFrameHeader(id, flags) {
+  const header = new ArrayBuffer(FRAME_HEADER_SIZE);
+  const view = new DataView(header);
+  view.setUint8(0, 0x42); // "B"
+  view.setUint8(1, 0x54); // "T"
+  view.setUint8(2, FRAME_VERSION);
+  view.setUint8(3, flags);
+  view.setUint32(4, id, true);
+  view.setFloat64(8, Date.now(), true);
+  new Uint8Array(header, 16, 16).set(sessionTag);
+  return header;
+}
+
 // Start tracking and connect to the WebSocket server
 async function startTracking() {
   try {
@@ -89,14 +121,23 @@ async function startTracking() {
 
     // Generate session ID
     sessionId = generateUUID();
+    sessionTag = uuidToBytes(sessionId);
+    frameId = 0;
     console.log("Generated session ID:", sessionId);
 
     // Connect to WebSocket
     const wsUrl = `ws://localhost:8000/ws`;
     console.log("Attempting WebSocket connection to:", wsUrl);
     webSocket = new WebSocket(wsUrl);
+    webSocket.binaryType = "arraybuffer";
 
     webSocket.onmessage = (event) => {
+      // Binary protocol: header + annotated JPEG
+      if (event.data instanceof ArrayBuffer) {
+        drawFrameBytes(event.data);
+        return;
+      }
+
       // Handle ping messages to keep connection alive
       if (event.data === "ping") {
         console.log("Received ping, sending pong");
@@ -109,7 +150,8 @@ async function startTracking() {
         const data = JSON.parse(event.data);
         // Use requestAnimationFrame for smooth updates
         requestAnimationFrame(() => {
-          updateOverlay(data);
+          // Binary protocol results carry no frame (it came as bytes)
+          if (data.type !== "result") updateOverlay(data);
           updateMetrics(data);
         });
       } catch (err) {
@@ -238,15 +280,33 @@ function startVideoProcessing() {
               frameQueue.length < MAX_QUEUE_SIZE
             ) {
               try {
-                // Higher quality for better tracking accuracy vs performance balance
-                const imageData = canvas.toDataURL("image/jpeg", 0.8);
-
-                // Add to queue instead of sending immediately
-                frameQueue.push(imageData);
-
-                // Process queue asynchronously
-                if (frameQueue.length === 1) {
-                  processFrameQueue();
+                if (USE_BINARY_PROTOCOL) {
+                  // Raw JPEG bytes behind a small header
+                  const id = ++frameId;
+                  canvas.toBlob(
+                    (blob) => {
+                      if (!blob || frameQueue.length >= MAX_QUEUE_SIZE) return;
+                      frameQueue.push(
+                        new Blob([encodeFrameHeader(id, FLAG_WANT_FRAME), blob])
+                      );
+                      if (frameQueue.length === 1) {
+                        processFrameQueue();
+                      }
+                    },
+                    "image/jpeg",
+                    0.8
+                  );
+                } else {
+                  // Higher quality for better tracking accuracy vs performance balance
+                  const imageData = canvas.toDataURL("image/jpeg", 0.8);
+
+                  // Add to queue instead of sending immediately
+                  frameQueue.push(imageData);
+
+                  // Process queue asynchronously
+                  if (frameQueue.length === 1) {
+                    processFrameQueue();
+                  }
                 }
               } catch (err) {
                 console.error("Error creating frame data:", err);
@@ -310,6 +370,24 @@ function updateOverlay(data) {
   img.src = data.processedFrame;
 }
 
+// Binary protocol: draw the JPEG that follows the frame header
+function drawFrameBytes(buffer) {
+  if (buffer.byteLength <= FRAME_HEADER_SIZE) return;
+  const blob = new Blob([new Uint8Array(buffer, FRAME_HEADER_SIZE)], {
+    type: "image/jpeg",
+  });
+  createImageBitmap(blob)
+    .then((bitmap) => {
+      const ctx = overlayCanvas.getContext("2d");
+      ctx.clearRect(0, 0, overlayCanvas.width, overlayCanvas.height);
+      ctx.drawImage(bitmap, 0, 0, overlayCanvas.width, overlayCanvas.height);
+      bitmap.close();
+    })
+    .catch(() => {
+      console.error("Failed to load processed frame");
+    });
+}
+
 // Optimized metrics update with throttling
 let lastMetricsUpdate = 0;
 const METRICS_UPDATE_INTERVAL = 100; // Update metrics every 100ms
@@ -0,0 +1,47 @@
+"""
+Shared fixtures. Run the suite from the repo root:
+    python -m pytest test/
+
+Tests that need the `server` fixture are skipped without best.pt next to server.py.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VIDEO_FRAMES = 30
+
+
+@pytest.fixture(scope="session")
+def server():
+    if not os.path.exists(os.path.join(ROOT, "best.pt")):
+        pytest.skip("best.pt not found")
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import server
+        yield server
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def video_frames():
+    return VIDEO_FRAMES
+
+
+@pytest.fixture
+def video(tmp_path):
+    """VIDEO_FRAMES frames of noise, 320x240 at 30 fps."""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (320, 240))
+    rng = np.random.default_rng(0)
+    for _ in range(VIDEO_FRAMES):
+        writer.write(rng.integers(0, 255, (240, 320, 3), dtype=np.uint8))
+    writer.release()
+    return path
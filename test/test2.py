@@ -3,6 +3,12 @@ import mediapipe as mp
 from deepface import DeepFace
 import threading
 import numpy as np
+import os
+import sys
+
+# Shared with the server (fixed_colab.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from behavior_rules import calculate_angle
 import math
 
 # --- 1. CONFIGURATION ---
@@ -25,22 +31,6 @@ holistic = mp_holistic.Holistic(
 
 # --- 3. HELPER FUNCTIONS ---
 
-def calculate_angle(a, b, c):
-    """
-    Calculates the angle at point b given three points [x, y]
-    """
-    a = np.array(a) # First
-    b = np.array(b) # Mid
-    c = np.array(c) # End
-    
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    
-    if angle > 180.0:
-        angle = 360-angle
-        
-    return angle
-
 def analyze_emotion(img):
     global current_emotion, faces_data
     try:
@@ -3,6 +3,12 @@ import mediapipe as mp
 from deepface import DeepFace
 import threading
 import numpy as np
+import os
+import sys
+
+# Shared with the server (fixed_colab.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from behavior_rules import calculate_angle
 import time
 
 # --- 1. CONFIGURATION ---
@@ -27,16 +33,6 @@ face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_fronta
 
 # --- 3. HELPER FUNCTIONS ---
 
-def calculate_angle(a, b, c):
-    """Calculates angle between three points (a-b-c)"""
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    if angle > 180.0: angle = 360-angle
-    return angle
-
 def analyze_emotions_multithread(frame_copy):
     """
     Runs DeepFace on the full image to find ALL faces and their emotions.
@@ -0,0 +1,73 @@
+"""
+BroadcastHub: one device owner at a time, per-client skip counts.
+"""
+import threading
+import time
+
+import numpy as np
+
+from broadcast import BroadcastHub, FrameBroadcaster
+from delivery import AdaptiveDelivery
+
+
+class FakeCapture:
+    """Slow camera that records when it is opened and released."""
+
+    def __init__(self, events, read_seconds=0.05):
+        self.events = events
+        self.read_seconds = read_seconds
+        self.opened = True
+        events.append("open")
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        time.sleep(self.read_seconds)
+        return self.opened, np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def release(self):
+        if self.opened:
+            self.opened = False
+            self.events.append("release")
+
+
+def _factory(events, read_seconds=0.05):
+    def process(frame, frame_idx, modes):
+        return {"raw": frame}, None
+    return lambda: FrameBroadcaster("fake", lambda: FakeCapture(events, read_seconds), process)
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_resubscribe_waits_for_previous_producer():
+    events = []
+    hub = BroadcastHub(grace_seconds=0)
+    factory = _factory(events, read_seconds=0.3)
+
+    stream = hub.subscribe("cam", "raw", factory)
+    next(stream)
+    stream.close()
+    _wait(lambda: not hub.stats())  # stopped, but still inside a slow read()
+
+    stream = hub.subscribe("cam", "raw", factory)
+    next(stream)
+    stream.close()
+    assert events[:3] == ["open", "release", "open"]
+
+
+def test_skipped_frames_are_counted_per_client():
+    events = []
+    hub = BroadcastHub(grace_seconds=0)
+    delivery = AdaptiveDelivery("slow")
+    stream = hub.subscribe("cam", "raw", _factory(events, read_seconds=0.01), delivery)
+    for _ in range(3):
+        next(stream)
+        time.sleep(0.1)  # a slow client misses the frames published meanwhile
+    stream.close()
+    assert delivery.frames_skipped > 0
@@ -0,0 +1,29 @@
+"""
+CropWriter must not hand out a crop path it never writes.
+"""
+import os
+
+import numpy as np
+
+from crop_writer import CropWriter
+
+
+def test_saturated_pool_returns_no_path(tmp_path):
+    os.makedirs(tmp_path / "man")
+    writer = CropWriter(str(tmp_path), max_pending=1)
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    # Saturate: one crop waiting that no worker will pick up
+    writer._pending["queued elsewhere"] = frame
+
+    assert writer.submit(("s", "man", 1), "man", "Man1", frame, (0, 0, 10, 10), 0.5, now=100.0) is None
+    assert writer.submit(("s", "man", 1), "man", "Man1", frame, (0, 0, 10, 10), 0.9, now=100.5) is None
+    assert writer.dropped == 2
+
+    writer._pending.clear()
+    path = writer.submit(("s", "man", 1), "man", "Man1", frame, (0, 0, 10, 10), 0.9, now=101.0)
+    writer.flush()
+    assert path and os.path.exists(path)
+
+    # Once a crop is kept for the window, a dropped better one still points to it
+    writer._pending["queued elsewhere"] = frame
+    assert writer.submit(("s", "man", 1), "man", "Man1", frame, (0, 0, 20, 20), 0.95, now=101.2) == path
@@ -0,0 +1,79 @@
+"""
+Detection log queries across rotated files, for both backends.
+"""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from detection_log import DETECTION_LOG_COLUMNS, create_log_sink
+
+
+def _row(frame, class_name="Person"):
+    values = {
+        "timestamp_iso": datetime.now().isoformat(timespec="milliseconds"),
+        "source": "test", "frame": frame,
+        "class": class_name, "human_id": "H1", "track_id": 1,
+        "conf": 0.9, "x1": 0, "y1": 0, "x2": 10, "y2": 10,
+        "crop_path": "", "posture_hint": "", "motion_score": 0.0, "child_by_scale_hint": 0,
+        "origin": "detected",
+    }
+    return [values[c] for c in DETECTION_LOG_COLUMNS]
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def sink(request, tmp_path):
+    # max_bytes=1: every flush with rows rotates the active file
+    sink = create_log_sink(request.param, str(tmp_path), batch_size=1000,
+                           flush_interval=60, max_bytes=1)
+    yield sink
+    sink.close()
+
+
+def test_query_spans_rotation(sink):
+    rows = [_row(i) for i in range(5)]
+    for row in rows[:3]:
+        sink.write(row)
+    sink.flush()
+    for row in rows[3:]:
+        sink.write(row)
+    sink.flush()
+    assert sink.rotations == 2
+
+    # A millisecond start inside the second the files were rotated in
+    found = sink.query(start=rows[0][0])
+    assert [r["frame"] for r in found] == [0, 1, 2, 3, 4]
+
+
+def test_class_filter_is_case_insensitive(sink):
+    # server.py writes lower-cased class names; the filter is lower-cased to match
+    sink.write(_row(0, "person"))
+    sink.write(_row(1, "bag"))
+    assert [r["frame"] for r in sink.query(class_name="person")] == [0]
+    assert [r["frame"] for r in sink.query(class_name="PERSON")] == [0]
+
+
+def test_query_stops_at_files_after_end(sink, monkeypatch):
+    sink.write(_row(0))
+    sink.flush()
+    sink.write(_row(1))
+    sink.flush()
+    scanned = []
+    query_file = sink._query_file
+    monkeypatch.setattr(sink, "_query_file", lambda path, *a: scanned.append(path) or query_file(path, *a))
+
+    assert sink.query(end="2000-01-01T00:00:00.000") == []
+    assert len(scanned) == 1  # only the oldest file can hold rows before its end stamp
+
+
+def test_old_header_log_does_not_overwrite_rotated_file(tmp_path):
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    rotated = tmp_path / f"tracking_log.{stamp}.csv"
+    rotated.write_text("earlier rotation\n")
+    (tmp_path / "tracking_log.csv").write_text("old,header\n1,2\n")
+
+    sink = create_log_sink("csv", str(tmp_path), flush_interval=60)
+    sink.close()
+    assert rotated.read_text() == "earlier rotation\n"
+    assert len(list(tmp_path.glob("tracking_log.*.csv"))) == 2
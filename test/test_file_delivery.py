@@ -0,0 +1,28 @@
+"""
+File streams must not JPEG-encode the frames their delivery profile drops.
+"""
+import re
+
+import pytest
+
+
+@pytest.mark.parametrize("mode", ["processed", "meta"])
+def test_dropped_frames_are_not_encoded(server, video, video_frames, mode):
+    # "minimal" caps delivery at 5 fps: about 1 in 6 frames of the 30 fps clip
+    delivery = server.AdaptiveDelivery("test", profile="minimal", adaptive=False)
+    encoded = []
+    encode = delivery.encode
+    delivery.encode = lambda image: encoded.append(1) or encode(image)
+
+    parts = list(server.generate_file_frames(video, delivery, mode))
+    jpegs = sum(part.count(b"Content-Type: image/jpeg") for part in parts)
+    assert 0 < jpegs <= len(encoded) <= 7
+    assert delivery.frames_skipped == video_frames - jpegs
+
+
+def test_meta_stream_has_every_frame(server, video, video_frames):
+    delivery = server.AdaptiveDelivery("test", profile="minimal", adaptive=False)
+    parts = list(server.generate_file_frames(video, delivery, "meta"))
+    json_parts = re.findall(rb"application/json\r\nX-Frame-Index: (\d+)", b"".join(parts))
+    indices = [int(i) for i in json_parts]
+    assert indices == list(range(video_frames))
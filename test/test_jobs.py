@@ -0,0 +1,36 @@
+"""
+Finished jobs are expired by age and by count.
+"""
+import time
+
+from jobs import JobManager
+
+
+def _finished_jobs(manager, n):
+    jobs = [manager.submit("missing.mp4") for _ in range(n)]
+    deadline = time.time() + 10
+    while any(job.finished_at is None for job in jobs):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return jobs
+
+
+def test_finished_jobs_are_capped():
+    manager = JobManager(lambda *a: None, lambda stream_id: None, max_workers=1, max_finished=2)
+    jobs = _finished_jobs(manager, 4)
+    assert all(job.status == "failed" for job in jobs)
+    assert [job.id for job in manager.list()] == [job.id for job in jobs[-2:]]
+
+
+def test_finished_jobs_expire():
+    manager = JobManager(lambda *a: None, lambda stream_id: None, retention_seconds=0)
+    job = _finished_jobs(manager, 1)[0]
+    assert manager.list() == []
+    assert manager.get(job.id) is None
+
+
+def test_cancelled_queued_job_is_finished():
+    manager = JobManager(lambda *a: None, lambda stream_id: None)
+    job = manager.submit("missing.mp4")
+    manager.cancel(job.id)
+    assert job.finished_at is not None
@@ -0,0 +1,71 @@
+"""
+Per-stream state must be gone once a stream is closed, including state that
+a frame still in flight at close time would otherwise recreate.
+"""
+import threading
+import time
+
+
+def _stream_keys(server):
+    with server.inference_service._trackers_lock:
+        trackers = set(server.inference_service._trackers)
+    with server._human_ids_lock:
+        human_ids = {key[0] for key in server.track_to_human_id}
+    return trackers | set(server._prev_gray) | set(server._motion_grids) | human_ids
+
+
+def test_closed_file_streams_leave_no_state(server, video):
+    before = _stream_keys(server)
+    for _ in range(2):
+        stream = server.generate_file_frames(video)
+        for _, _ in zip(range(2), stream):
+            pass
+        stream.close()
+    assert _stream_keys(server) - before == set()
+
+
+def test_finished_file_stream_leaves_no_state(server, video):
+    before = _stream_keys(server)
+    for _ in server.generate_file_frames(video):
+        pass
+    assert _stream_keys(server) - before == set()
+
+
+def _wait_job(server, job, timeout=60):
+    # finished_at is set once the job's pipeline has been closed
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if job.status in ("done", "failed", "cancelled") and (job.started_at is None or job.finished_at):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job.id} did not finish")
+
+
+def test_cancelled_and_finished_jobs_leave_no_state(server, video):
+    before = _stream_keys(server)
+    done = server.job_manager.submit(video)
+    cancelled = server.job_manager.submit(video)
+    while cancelled.frames_done < 2 and cancelled.status in ("queued", "running"):
+        time.sleep(0.01)
+    server.job_manager.cancel(cancelled.id)
+    _wait_job(server, done)
+    _wait_job(server, cancelled)
+    assert done.status == "done"
+    assert _stream_keys(server) - before == set()
+
+
+def test_concurrent_streams_get_distinct_human_ids(server):
+    ids = []
+
+    def assign(stream_id):
+        for track_id in range(200):
+            ids.append(server._get_human_id(stream_id, "man", track_id))
+        server._release_stream(stream_id)
+
+    threads = [threading.Thread(target=assign, args=(f"test-ids-{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids) == 800
+    assert not any(key[0].startswith("test-ids-") for key in server.track_to_human_id)